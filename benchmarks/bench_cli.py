@@ -0,0 +1,52 @@
+"""
+The subfeed command line against `split` plus background jobs. Writes a
+file of text records, then times N copies of a command processing it:
+split into N files and run one job per file, or stream it through
+`subfeed -j N` from the file and from a pipe.
+
+    PYTHONPATH=src python benchmarks/bench_cli.py --gigabytes 4 --jobs 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def timed(script: str, cwd: str) -> float:
+    # Runs in cwd, so a relative PYTHONPATH=src must be resolved first
+    path = os.environ.get("PYTHONPATH", "").split(os.pathsep)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(os.path.abspath(p) for p in path if p)}
+    start = time.perf_counter()
+    subprocess.run(["bash", "-c", script], cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--gigabytes", type=float, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--command", default="wc -l")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "input.txt")
+        line = b"%s\n" % (b"x" * 99)
+        with open(path, "wb") as f:
+            block = line * 10_000
+            for _ in range(int(args.gigabytes * (1 << 30)) // len(block)):
+                f.write(block)
+        size = os.path.getsize(path)
+
+        subfeed = f"{sys.executable} -m subfeed -j {args.jobs} -b 4M"
+        runs = {
+            "split + jobs": f"split -n l/{args.jobs} input.txt part. && "
+                            f"for part in part.*; do {args.command} < $part & done; wait; rm part.*",
+            "subfeed file": f"{subfeed} -i input.txt -- {args.command}",
+            "subfeed pipe": f"cat input.txt | {subfeed} -- {args.command}",
+        }
+        for label, script in runs.items():
+            seconds = timed(script, dir)
+            print(f"{label:<13} {seconds:6.2f} s  {size / seconds / 1e6:7.0f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Records/sec for each dispatch policy against children of deliberately
+different speeds: worker i sleeps (i + 1) * --delay seconds per record.
+Records are large enough that a pipe buffer only holds a few of them.
+
+    PYTHONPATH=src python benchmarks/bench_dispatch.py --count 4
+"""
+import argparse
+import os
+import time
+from subfeed import *
+
+CHILD = os.path.join(os.path.dirname(__file__), "children", "throttled.py")
+
+class LineWriter(Writer):
+    def filter(self, batch):
+        return batch
+
+class Heterogeneous(Coordinator):
+    "Binds a per-task delay into the child's arguments"
+    def __post_init__(self):
+        super().__post_init__()
+        for i, task in enumerate(self.tasks):
+            task.args = f"python {CHILD} {(i + 1) * self.delay}"
+
+def run(policy: str, records: int, count: int, delay: float, size: int) -> float:
+    template = TaskTemplate(args="true")
+    specs = {"stdin": WriterSpec(LineWriter)}
+    Heterogeneous.delay = delay
+
+    record = b"x" * (size - 1) + b"\n"
+    start = time.perf_counter()
+    with Heterogeneous(template, count=count, writer_specs=specs, dispatch=policy) as swarm:
+        for i in range(records):
+            swarm.feed(record)
+    return records / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.001)
+    parser.add_argument("--record-bytes", type=int, default=16384)
+    parser.add_argument(
+        "--policies", nargs="+",
+        default=["shared", "round_robin", "least_bytes", "writable"]
+    )
+    args = parser.parse_args()
+
+    for policy in args.policies:
+        rate = run(policy, args.records, args.count, args.delay, args.record_bytes)
+        print(f"{policy:<12} {rate:>10,.0f} records/s")
+
+if __name__ == "__main__":
+    main()
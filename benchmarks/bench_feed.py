@@ -0,0 +1,41 @@
+"""
+Records/sec for Coordinator.feed versus Coordinator.feed_many.
+
+    PYTHONPATH=src python benchmarks/bench_feed.py --records 200000
+"""
+import argparse
+import time
+from subfeed import *
+
+class LineWriter(Writer):
+    def filter(self, batch):
+        return batch + b"\n"
+
+def run(records: int, count: int, chunk_size: int = 0) -> float:
+    template = TaskTemplate(args="cat > /dev/null")
+    specs = {"stdin": WriterSpec(LineWriter, coalesce_bytes=1 << 16)}
+    data = (b"%d" % i for i in range(records))
+
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs=specs) as swarm:
+        if chunk_size:
+            swarm.feed_many(data, chunk_size=chunk_size)
+        else:
+            for record in data:
+                swarm.feed(record)
+    return records / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--count", type=int, default=2)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 1024])
+    args = parser.parse_args()
+
+    print(f"feed                     {run(args.records, args.count):>12,.0f} records/s")
+    for chunk_size in args.chunk_sizes:
+        rate = run(args.records, args.count, chunk_size)
+        print(f"feed_many(chunk={chunk_size:<6}) {rate:>12,.0f} records/s")
+
+if __name__ == "__main__":
+    main()
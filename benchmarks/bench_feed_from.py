@@ -0,0 +1,43 @@
+"""
+Records/sec feeding a file of newline-delimited records: reading lines in
+Python and calling feed_many, versus feed_from, which maps the file and
+dispatches whole blocks without one object per record.
+
+    PYTHONPATH=src python benchmarks/bench_feed_from.py --records 2000000
+"""
+import argparse
+import tempfile
+import time
+from subfeed import *
+
+def run(path: str, records: int, count: int, method: str, chunk_bytes: int) -> float:
+    template = TaskTemplate(args="cat > /dev/null")
+    specs = {"stdin": WriterSpec(Writer, coalesce_bytes=1 << 16)}
+
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs=specs) as swarm:
+        if method == "feed_many":
+            with open(path, "rb") as source:
+                swarm.feed_many(source, chunk_size=1024)
+        else:
+            swarm.feed_from(path, chunk_bytes=chunk_bytes)
+    return records / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=2_000_000)
+    parser.add_argument("--count", type=int, default=2)
+    parser.add_argument("--chunk-bytes", type=int, nargs="+", default=[1 << 16, 1 << 20])
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".txt") as source:
+        source.write(b"".join(b"%d\trecord\n" % i for i in range(args.records)))
+        source.flush()
+        rate = run(source.name, args.records, args.count, "feed_many", 0)
+        print(f"lines + feed_many              {rate:>12,.0f} records/s")
+        for chunk_bytes in args.chunk_bytes:
+            rate = run(source.name, args.records, args.count, "feed_from", chunk_bytes)
+            print(f"feed_from(chunk_bytes={chunk_bytes:<8}) {rate:>12,.0f} records/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Peak RSS of the Coordinator with item-count queue limits against a byte
+budget. Feeds a mix of small records and a few large ones to children
+that sleep after each record, so the queues fill. Each
+configuration runs in a fresh process so its peak RSS is its own.
+
+    PYTHONPATH=src python benchmarks/bench_memory.py --large-mb 64 --budgets 64 256
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from subfeed import *
+
+CHILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "children", "throttled.py")
+
+def run(count: int, items: int, large: int, budget: int | None, delay: float):
+    sizes = random.Random(0).choices([100, 10_000, large], weights=[80, 15, 5], k=items)
+    template = TaskTemplate(args=[sys.executable, CHILD, str(delay)], stdout=FileChannel("/dev/null"))
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs={"stdin": WriterSpec(Writer)},
+                     memory_budget=budget) as swarm:
+        for size in sizes:
+            swarm.feed(b"x" * (size - 1) + b"\n")
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{sum(sizes) / seconds / 1e6:8.0f} MB/s  peak RSS {peak:7.0f} MB  "
+          f"budget peak {swarm.stats().memory_peak / 1e6:6.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--large-mb", type=int, default=64)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[64, 256], help="budgets in MB")
+    parser.add_argument("--delay", type=float, default=0.001, help="seconds a child sleeps per record")
+    parser.add_argument("--run", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        count, items, large, budget = map(int, args.run[:4])
+        run(count, items, large, budget or None, float(args.run[4]))
+        return
+
+    large = args.large_mb << 20
+    for budget in [0, *args.budgets]:
+        label = f"budget {budget} MB" if budget else "item limits"
+        print(f"{label:<15}", end=" ", flush=True)
+        subprocess.run([sys.executable, __file__, "--run", str(args.count), str(args.items),
+                        str(large), str(budget << 20), str(args.delay)], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+MB/sec into `cat > /dev/null` children for different pipe buffer sizes.
+
+    PYTHONPATH=src python benchmarks/bench_pipe_size.py --record-bytes 1048576
+"""
+import argparse
+import time
+from subfeed import *
+
+def run(pipe_size: int | None, records: int, count: int, size: int):
+    template = TaskTemplate(args="cat > /dev/null", pipe_size=pipe_size)
+    specs = {"stdin": WriterSpec(Writer, raw=True)}
+    record = b"x" * size
+
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs=specs) as swarm:
+        for _ in range(records):
+            swarm.feed(record)
+    elapsed = time.perf_counter() - start
+    return records * size / elapsed / 1e6, swarm.tasks[0].pipe_sizes["stdin"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--count", type=int, default=2)
+    parser.add_argument("--record-bytes", type=int, default=1 << 20)
+    parser.add_argument(
+        "--pipe-sizes", type=int, nargs="+", default=[0, 1 << 18, 1 << 20]
+    )
+    args = parser.parse_args()
+
+    for pipe_size in args.pipe_sizes:
+        rate, effective = run(pipe_size or None, args.records, args.count, args.record_bytes)
+        label = effective or "default"
+        print(f"pipe_size={label:<10} {rate:>10,.0f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Run-to-run variance with and without CPU placement. Feeds the same data
+to compute-bound children (`gzip -1`) several times per placement, and
+reports the mean throughput and its coefficient of variation. Differences
+show on machines with many cores, and most on multi-socket ones.
+
+    PYTHONPATH=src python benchmarks/bench_placement.py --count 32 --runs 10
+"""
+import argparse
+import os
+import statistics
+import time
+from subfeed import *
+
+def run(count: int, megabytes: int, placement: dict, nice: int | None) -> float:
+    block = os.urandom(1 << 16)
+    blocks = megabytes << 4
+    template = TaskTemplate(args="gzip -1 -c", stdout=FileChannel("/dev/null"), nice=nice)
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs={"stdin": WriterSpec(Writer, raw=True)},
+                     **placement) as swarm:
+        for _ in range(blocks):
+            swarm.feed(block)
+    return megabytes / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=os.cpu_count())
+    parser.add_argument("--megabytes", type=int, default=512)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--nice", type=int)
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0))
+    placements = {
+        "unpinned": {},
+        "cpu": {"pin": "cpu"},
+        "numa": {"pin": "numa"},
+    }
+    if cpus > 2:
+        placements["cpu + 2 reserved"] = {"pin": "cpu", "coordinator_cpus": 2}
+    print(f"{args.count} children, {cpus} CPUs, {len(numa_nodes())} NUMA nodes")
+    for label, placement in placements.items():
+        rates = [run(args.count, args.megabytes, placement, args.nice) for _ in range(args.runs)]
+        mean = statistics.mean(rates)
+        cv = statistics.stdev(rates) / mean if len(rates) > 1 else 0.
+        print(f"{label:<17} {mean:8.1f} MB/s  cv {cv:6.1%}  min {min(rates):7.1f}  max {max(rates):7.1f}")
+
+if __name__ == "__main__":
+    main()
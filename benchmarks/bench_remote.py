@@ -0,0 +1,55 @@
+"""
+Throughput of remote tasks. Feeds records through `cat` children run
+locally, on a TCP agent and on a Unix-socket agent, all on this host, and
+reads them back from stdout.
+
+    PYTHONPATH=src python benchmarks/bench_remote.py --records 1000000
+"""
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from subfeed import *
+
+def run(agent: str | None, count: int, records: int, size: int) -> float:
+    record = b"x" * (size - 1) + b"\n"
+    specs = {"stdin": WriterSpec(Writer)}
+    readers = {"stdout": ReaderSpec()}
+    start = time.perf_counter()
+    with Coordinator(TaskTemplate(args="cat", agent=agent), count=count,
+                     writer_specs=specs, reader_specs=readers,
+                     on_result=lambda result: None) as swarm:
+        swarm.feed_many((record for _ in range(records)), chunk_size=1024)
+    return records / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    # The agents inherit the key, and the Coordinators read it back
+    os.environ.setdefault("SUBFEED_AGENT_KEY", secrets.token_hex(16))
+    socket_path = os.path.join(tempfile.mkdtemp(), "agent.sock")
+    agents = [
+        subprocess.Popen([sys.executable, "-m", "subfeed.agent", address],
+                         stdout=subprocess.PIPE, text=True)
+        for address in ["tcp://127.0.0.1:0", f"unix:{socket_path}"]
+    ]
+    try:
+        addresses = [agent.stdout.readline().split()[-1] for agent in agents]
+        for count in args.counts:
+            for label, agent in [("local", None), ("tcp", addresses[0]), ("unix", addresses[1])]:
+                rate = run(agent, count, args.records, args.size)
+                print(f"{count:>3} workers {label:<5}  {rate / 1e6:6.2f}M records/s  "
+                      f"{rate * args.size / 1e6:7.1f} MB/s")
+    finally:
+        for agent in agents:
+            agent.kill()
+
+if __name__ == "__main__":
+    main()
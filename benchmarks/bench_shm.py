@@ -0,0 +1,48 @@
+"""
+MB/sec of large records into children through a pipe on stdin vs a
+shared-memory ring (ShmChannel). Each child materializes every record:
+a bytes object read from the pipe, or a memoryview into the ring.
+
+    PYTHONPATH=src python benchmarks/bench_shm.py --record-bytes 4194304
+"""
+import argparse
+import os
+import sys
+import time
+from subfeed import *
+
+CHILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "children", "records.py")
+
+def run(channel: str, records: int, count: int, size: int, ring: int) -> float:
+    if channel == "pipe":
+        template = TaskTemplate(args=f"{sys.executable} {CHILD} pipe {size}")
+        specs = {"stdin": WriterSpec(Writer)}
+    else:
+        template = TaskTemplate(
+            args=f"{sys.executable} {CHILD} shm data",
+            sidein={"data": ShmChannel(size=ring)}
+        )
+        specs = {"data": WriterSpec(Writer)}
+    record = b"x" * size
+
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs=specs) as swarm:
+        for _ in range(records):
+            swarm.feed(record)
+    elapsed = time.perf_counter() - start
+    return records * size / elapsed / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--count", type=int, default=2)
+    parser.add_argument("--record-bytes", type=int, default=4 << 20)
+    parser.add_argument("--ring-bytes", type=int, default=64 << 20)
+    args = parser.parse_args()
+
+    for channel in ["pipe", "shm"]:
+        rate = run(channel, args.records, args.count, args.record_bytes, args.ring_bytes)
+        print(f"{channel:<5} {rate:>10,.0f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Startup cost of large swarms. Times start() (first worker online), all
+workers online and close(), with the child exec'd directly or through
+/bin/sh. Then runs a series of short jobs on one warm pool, ending each
+with end_session(), against a fresh Coordinator per job.
+
+    PYTHONPATH=src python benchmarks/bench_startup.py --counts 100 200
+"""
+import argparse
+import time
+from subfeed import *
+
+def startup(args: str, count: int) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    swarm = Coordinator(TaskTemplate(args=args), count=count, writer_specs={"stdin": WriterSpec(Writer)})
+    swarm.start()
+    first = time.perf_counter() - start
+    with swarm.online:
+        swarm.online.wait_for(lambda: not swarm.launching)
+    online = time.perf_counter() - start
+    swarm.close()
+    return first, online, time.perf_counter() - start - online
+
+def jobs(count: int, jobs: int, warm: bool) -> float:
+    template = TaskTemplate(args="cat")
+    specs = {"stdin": WriterSpec(Writer)}
+    readers = {"stdout": ReaderSpec()}
+    job = [b"%d\n" % i for i in range(1000)]
+
+    start = time.perf_counter()
+    if warm:
+        with Coordinator(
+            template, count=count, writer_specs=specs, reader_specs=readers,
+            session_marker=b"--end--\n"
+        ) as pool:
+            for _ in range(jobs):
+                pool.feed_many(job, chunk_size=100)
+                pool.end_session()
+                assert sum(1 for _ in pool.results()) == len(job)
+    else:
+        for _ in range(jobs):
+            with Coordinator(template, count=count, writer_specs=specs, reader_specs=readers) as swarm:
+                swarm.feed_many(job, chunk_size=100)
+            assert sum(1 for _ in swarm.results()) == len(job)
+    return (time.perf_counter() - start) / jobs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--jobs", type=int, default=10)
+    args = parser.parse_args()
+
+    # "exec cat" starts with a shell builtin, so it still goes through /bin/sh
+    for count in args.counts:
+        for label, command in [("exec", "cat"), ("shell", "exec cat")]:
+            first, online, close = startup(command, count)
+            print(f"{count:>4} workers {label:<5}  first {first * 1e3:7.1f} ms  "
+                  f"all {online * 1e3:7.1f} ms  close {close * 1e3:6.1f} ms")
+
+    for count in args.counts:
+        cold = jobs(count, args.jobs, warm=False)
+        warm = jobs(count, args.jobs, warm=True)
+        print(f"{count:>4} workers  per job: cold {cold * 1e3:7.1f} ms  warm session {warm * 1e3:6.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Overhead of per-batch tracing. Feeds small batches with tracing off, at a
+1% sample rate and with every batch traced, and reports the feed rate of
+each. Then prints the stage histograms of the 1% run, and with --export
+writes its timeline for ui.perfetto.dev.
+
+    PYTHONPATH=src python benchmarks/bench_trace.py --items 500000 --export trace.json
+"""
+import argparse
+import time
+from subfeed import *
+
+def run(count: int, items: int, rate: float) -> tuple[float, Coordinator]:
+    line = b"x" * 99 + b"\n"
+    template = TaskTemplate(args="cat", stdout=FileChannel("/dev/null"))
+    start = time.perf_counter()
+    with Coordinator(template, count=count, writer_specs={"stdin": WriterSpec(Writer, raw=True)},
+                     trace_rate=rate) as swarm:
+        for _ in range(items):
+            swarm.feed(line)
+    return items / (time.perf_counter() - start), swarm
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--export", help="write the 1%% run's timeline here")
+    args = parser.parse_args()
+
+    swarms = {}
+    for label, rate in [("off", 0.), ("1%", 0.01), ("100%", 1.)]:
+        best = 0.
+        for _ in range(args.runs):
+            rate_per_second, swarms[label] = run(args.count, args.items, rate)
+            best = max(best, rate_per_second)
+        print(f"tracing {label:<5} {best:10.0f} batches/s")
+
+    tracer = swarms["1%"].tracer
+    for stage, histogram in tracer.histograms().items():
+        print(f"{stage}: {histogram}")
+    if args.export:
+        tracer.export(args.export)
+        print(f"wrote {len(tracer.traces)} traces to {args.export}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Multi-fd consumer: reads stdin and every side channel named on the
+command line in lockstep, one line from each per record, like
+tests/print_fibonaccis.py, and discards them.
+
+    python drain.py [SIDE_CHANNEL ...]
+"""
+import os
+import sys
+
+inputs = [sys.stdin.buffer] + [open(int(os.environ[name]), "rb") for name in sys.argv[1:]]
+for _ in zip(*inputs):
+    pass
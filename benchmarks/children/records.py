@@ -0,0 +1,19 @@
+"""
+Consumer of fixed-size records that touches one byte of each, either
+read from the pipe on stdin or zero-copy from a ShmChannel.
+
+    python records.py pipe SIZE
+    python records.py shm CHANNEL
+"""
+import sys
+
+total = 0
+if sys.argv[1] == "pipe":
+    size = int(sys.argv[2])
+    while record := sys.stdin.buffer.read(size):
+        total += record[-1]
+else:
+    from subfeed import ShmReader
+    for record in ShmReader.from_env(sys.argv[2]):
+        total += record[-1]
+print(total)
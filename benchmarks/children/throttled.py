@@ -0,0 +1,11 @@
+"""
+Consume stdin line by line, sleeping DELAY seconds per line.
+
+    python throttled.py DELAY
+"""
+import sys
+import time
+
+delay = float(sys.argv[1])
+for line in sys.stdin.buffer:
+    time.sleep(delay)
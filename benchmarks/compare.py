@@ -0,0 +1,43 @@
+"""
+Compare two benchmarks/suite.py JSON reports scenario by scenario.
+
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import json
+from collections import defaultdict
+from statistics import median
+
+METRICS = ["records_per_sec", "mb_per_sec", "startup_sec", "shutdown_sec"]
+
+def load(path: str):
+    with open(path) as f:
+        report = json.load(f)
+    runs = defaultdict(list)
+    for result in report["results"]:
+        key = json.dumps(result["scenario"], sort_keys=True)
+        runs[key].append(result)
+    return report["environment"], {
+        key: {metric: median(r[metric] for r in results) for metric in METRICS}
+        for key, results in runs.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    env_before, before = load(args.before)
+    env_after, after = load(args.after)
+    print(f"before: {env_before.get('revision')}  after: {env_after.get('revision')}")
+    for key in sorted(before.keys() & after.keys()):
+        scenario = ",".join(f"{k}={v}" for k, v in json.loads(key).items())
+        print(scenario)
+        for metric in METRICS:
+            old, new = before[key][metric], after[key][metric]
+            ratio = new / old if old else float("nan")
+            print(f"    {metric:<16} {old:>14.4g} -> {new:>14.4g}  x{ratio:.2f}")
+
+if __name__ == "__main__":
+    main()
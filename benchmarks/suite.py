@@ -0,0 +1,203 @@
+"""
+Throughput, latency and startup benchmarks for subfeed.
+
+Runs a grid of scenarios against local synthetic children and writes
+machine-readable JSON (see benchmarks/compare.py to diff two runs):
+
+    PYTHONPATH=src python benchmarks/suite.py --output before.json
+    PYTHONPATH=src python benchmarks/suite.py --full --output after.json
+    python benchmarks/compare.py before.json after.json
+
+Children:
+    sink   cat > /dev/null
+    slow   benchmarks/children/throttled.py, sleeping per record
+    drain  benchmarks/children/drain.py, reading stdin and every side
+           channel in lockstep
+
+Each scenario reports records/sec and MB/sec over feed + drain, the time
+from start() until it returns (first worker online), and close() latency
+once every batch has already been written.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List
+from subfeed import *
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHILDREN = {
+    "sink": "cat > /dev/null",
+    "slow": f"{sys.executable} {HERE}/children/throttled.py 0.0001",
+    "drain": f"{sys.executable} {HERE}/children/drain.py",
+}
+
+class RecordWriter(Writer):
+    "Records are pre-encoded bytes ending in a newline"
+    def filter(self, batch):
+        return batch
+
+@dataclass
+class Scenario:
+    child: str = "sink"
+    count: int = 2
+    record_bytes: int = 64
+    records: int = 20_000
+    side_channels: int = 0
+    writer_queue_maxsize: int = 2
+    common_queue_multiplier: int = 10
+    chunk_size: int = 0          # 0 feeds records one at a time
+    engine: str = "threads"
+
+    @property
+    def name(self) -> str:
+        return ",".join(f"{k}={v}" for k, v in asdict(self).items())
+
+@dataclass
+class Measurement:
+    scenario: Dict
+    records_per_sec: float
+    mb_per_sec: float
+    startup_sec: float
+    shutdown_sec: float
+    feed_blocked_sec: float
+    elapsed_sec: float
+
+def coordinator(scenario: Scenario) -> Coordinator:
+    sides = [f"side{i}" for i in range(scenario.side_channels)]
+    args = CHILDREN[scenario.child]
+    if scenario.child == "drain":
+        args = " ".join([args, *sides])
+    template = TaskTemplate(
+        args=args,
+        sidein={name: AnonChannel() for name in sides}
+    )
+    specs = {name: WriterSpec(RecordWriter) for name in ["stdin", *sides]}
+    return Coordinator(
+        template,
+        count=scenario.count,
+        writer_specs=specs,
+        engine=scenario.engine,
+        writer_queue_maxsize=scenario.writer_queue_maxsize,
+        common_queue_multiplier=scenario.common_queue_multiplier
+    )
+
+def drained(swarm: Coordinator, batches: int) -> bool:
+    written = swarm.stats().items_written
+    return bool(written) and all(count >= batches for count in written.values())
+
+def measure(scenario: Scenario) -> Measurement:
+    record = b"x" * (scenario.record_bytes - 1) + b"\n"
+    swarm = coordinator(scenario)
+
+    start = time.perf_counter()
+    swarm.start()
+    started = time.perf_counter()
+
+    if scenario.chunk_size:
+        records = itertools.repeat(record, scenario.records)
+        swarm.feed_many(records, chunk_size=scenario.chunk_size)
+    else:
+        for _ in range(scenario.records):
+            swarm.feed(record)
+    batches = swarm.fed
+    while not drained(swarm, batches):
+        time.sleep(0.0005)
+    written = time.perf_counter()
+
+    swarm.close()
+    closed = time.perf_counter()
+
+    elapsed = written - started
+    return Measurement(
+        scenario = asdict(scenario),
+        records_per_sec = scenario.records / elapsed,
+        mb_per_sec = scenario.records * scenario.record_bytes / elapsed / 1e6,
+        startup_sec = started - start,
+        shutdown_sec = closed - written,
+        feed_blocked_sec = swarm.feed_time,
+        elapsed_sec = closed - start
+    )
+
+def grid(full: bool) -> List[Scenario]:
+    if not full:
+        return [
+            Scenario(),
+            Scenario(count=4),
+            Scenario(record_bytes=4096),
+            Scenario(chunk_size=256),
+            Scenario(child="drain", side_channels=2),
+            Scenario(engine="epoll"),
+            Scenario(child="slow", records=2000),
+        ]
+    axes = {
+        "child": ["sink", "drain"],
+        "count": [1, 4, 16],
+        "record_bytes": [64, 4096, 65536],
+        "side_channels": [0, 2],
+        "writer_queue_maxsize": [2, 16],
+        "common_queue_multiplier": [2, 10],
+    }
+    scenarios = []
+    for values in itertools.product(*axes.values()):
+        params = dict(zip(axes, values))
+        if params["child"] == "sink" and params["side_channels"]:
+            continue
+        params["records"] = max(1000, 20_000_000 // (params["record_bytes"] * 100))
+        scenarios.append(Scenario(**params))
+    return scenarios
+
+def environment() -> Dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+            capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--full", action="store_true", help="run the full parameter grid")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--filter", default="", help="only scenarios whose name contains this")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    results = []
+    for scenario in grid(args.full):
+        if args.filter not in scenario.name:
+            continue
+        for _ in range(args.repeat):
+            result = measure(scenario)
+            results.append(asdict(result))
+            print(
+                f"{scenario.name}: {result.records_per_sec:,.0f} rec/s "
+                f"{result.mb_per_sec:,.1f} MB/s startup {result.startup_sec * 1e3:.1f} ms "
+                f"shutdown {result.shutdown_sec * 1e3:.1f} ms",
+                file=sys.stderr
+            )
+
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
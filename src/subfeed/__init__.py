@@ -1,6 +1,19 @@
-from .channel import Channel, SubprocessPipe, AnonChannel, HandleChannel, PathChannel, FileChannel
-from .coordinator import Coordinator, WriterSpec
+from .channel import Channel, SubprocessPipe, AnonChannel, HandleChannel, FdChannel, PathChannel, FileChannel, ShmChannel, SocketChannel
+from .async_coordinator import AsyncCoordinator
+from .budget import MemoryBudget
+from .chunk import Chunk, Block
+from .coordinator import Coordinator, WriterSpec, ReaderSpec
+from .dispatch import (
+    Dispatcher, RoundRobin, LeastBytes, Writable, Partitioned, SkewWarning, default_sizer
+)
+from .placement import IOPRIO_CLASS_RT, IOPRIO_CLASS_BE, IOPRIO_CLASS_IDLE, numa_nodes
+from .rawio import FileRegion, write_all
+from .shm import ShmReader
+from .reader import Reader, Result
+from .reorder import Reorder, Sequenced
+from .stats import Stats, WorkerStats, ChannelStats, ScalingEvent, Failure
 from .sync_context import SyncContext, EventField
 from .task import TaskTemplate, Task
+from .trace import Tracer, Trace, Histogram
 from .worker import Worker
 from .writer import identity, Writer
\ No newline at end of file
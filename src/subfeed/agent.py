@@ -0,0 +1,245 @@
+"""
+Runs tasks for remote Coordinators, relaying their channels over sockets.
+
+    SUBFEED_AGENT_KEY=$(cat ~/.subfeed-key) python -m subfeed.agent tcp://127.0.0.1:7070
+    python -m subfeed.agent unix:/run/subfeed.sock
+
+A Coordinator places a task here when its agent (TaskTemplate.agent or
+Coordinator.agents) is this address. Every connection starts with one
+JSON line. {"control": true} opens a Coordinator's control connection.
+The agent answers with a challenge, and serves the connection only if
+the reply proves the Coordinator holds the agent's key (see
+subfeed.remote). TCP agents require a key, as any client that reaches
+them could otherwise run commands; Unix sockets are made private to
+their owner and the key is optional. A control connection carries
+spawn requests and signals in and spawn replies and exit statuses out.
+When it closes, the agent kills the tasks it started.
+{"token": ..., "channel": name} attaches a connection to one channel of
+a spawned task, which is then relayed to or from the child's pipe in
+blocks of up to RELAY_BYTES, with splice(2) for TCP.
+"""
+import argparse
+import errno
+import hmac
+import json
+import os
+import secrets
+import socket
+from dataclasses import dataclass
+from threading import Thread, Lock
+from typing import Any, Callable, Dict, IO
+from .channel import Channel, SubprocessPipe, AnonChannel, FileChannel, parse_address
+from .task import Task, Mode
+from .remote import KEY_ENV, agent_key, proof
+
+RELAY_BYTES = 1 << 20
+
+def relay(src: int, dst: int, splice: bool = True):
+    "Copy src to dst until EOF, with splice(2) if asked and one side is a pipe"
+    splice = getattr(os, "splice", None) if splice else None
+    while True:
+        if splice is not None:
+            try:
+                if not splice(src, dst, RELAY_BYTES):
+                    return
+                continue
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                splice = None
+        data = os.read(src, RELAY_BYTES)
+        if not data:
+            return
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst, view):]
+
+def recv_line(conn: socket.socket) -> bytes:
+    "Read the hello line without buffering past it"
+    line = bytearray()
+    while not line.endswith(b"\n"):
+        byte = conn.recv(1)
+        if not byte:
+            raise ConnectionError("connection closed before its hello line")
+        line += byte
+    return bytes(line)
+
+def channel(description: Any, name: str) -> Channel | None:
+    "Local channel for a description made by subfeed.remote.describe"
+    match description:
+        case None: return None
+        case "pipe" if name in ("stdin", "stdout", "stderr"): return SubprocessPipe(name = name)
+        case "pipe": return AnonChannel()
+        case {"path": path, "append": append}: return FileChannel(path, append = append)
+    raise ValueError(f"unknown channel description {description!r}")
+
+@dataclass
+class Agent:
+    address: str = "tcp://127.0.0.1:7070"
+
+    # Shared with the Coordinators, by default from SUBFEED_AGENT_KEY
+    key: bytes | None = None
+
+    def __post_init__(self):
+        if self.key is None:
+            self.key = agent_key()
+        family, addr = parse_address(self.address)
+        if family != socket.AF_UNIX and not self.key:
+            raise ValueError(f"a TCP agent needs a key: set {KEY_ENV} or use a Unix socket")
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family != socket.AF_UNIX:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(addr)
+        if family == socket.AF_UNIX:
+            os.chmod(addr, 0o600)
+        self.listener.listen(128)
+        if family != socket.AF_UNIX:
+            host, port = self.listener.getsockname()[:2]
+            self.address = f"tcp://{host}:{port}"
+
+        # Relayed channels of spawned tasks awaiting their connection:
+        # token -> channel name -> (parent end, True for inputs)
+        self.pending: Dict[str, Dict[str, tuple[IO, bool]]] = {}
+        self.lock = Lock()
+
+    def serve(self):
+        while True:
+            conn, _ = self.listener.accept()
+            Thread(target = self.handle, args = (conn,), daemon = True).start()
+
+    def handle(self, conn: socket.socket):
+        try:
+            hello = json.loads(recv_line(conn))
+            if hello.get("control"):
+                if self.authenticate(conn):
+                    self.control(conn)
+            else:
+                self.attach(conn, hello["token"], hello["channel"])
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            conn.close()
+
+    def authenticate(self, conn: socket.socket) -> bool:
+        "Challenge a control connection to prove it holds the key"
+        challenge = secrets.token_hex(16)
+        conn.sendall(json.dumps({"challenge": challenge}).encode() + b"\n")
+        answer = str(json.loads(recv_line(conn)).get("proof", ""))
+        authenticated = not self.key or hmac.compare_digest(answer, proof(self.key, challenge))
+        conn.sendall(json.dumps({"authenticated": authenticated}).encode() + b"\n")
+        return authenticated
+
+    def control(self, conn: socket.socket):
+        "Serve one Coordinator's control connection"
+        tasks: Dict[int, Task] = {}
+        lock = Lock()
+        def send(message: Dict):
+            with lock:
+                conn.sendall(json.dumps(message).encode() + b"\n")
+
+        try:
+            for line in conn.makefile("rb"):
+                message = json.loads(line)
+                if "spawn" in message:
+                    self.spawn(message, send, tasks)
+                elif "signal" in message and message["signal"] in tasks:
+                    tasks[message["signal"]].process.send_signal(message["number"])
+        finally:
+            for task in list(tasks.values()):
+                if task.process.poll() is None:
+                    task.process.kill()
+
+    def spawn(self, message: Dict, send: Callable[[Dict], None], tasks: Dict[int, Task]):
+        id = message["spawn"]
+        try:
+            task = Task(
+                args = message["args"],
+                stdin = channel(message["stdin"], "stdin"),
+                stdout = channel(message["stdout"], "stdout"),
+                stderr = channel(message["stderr"], "stderr"),
+                sidein = {name: channel(d, name) for name, d in message["sidein"].items()},
+                sideout = {name: channel(d, name) for name, d in message["sideout"].items()},
+                pipe_size = message["pipe_size"],
+                cpus = message.get("cpus"),
+                nice = message.get("nice"),
+                ioprio = message.get("ioprio")
+            )
+            inputs = {"stdin": task.stdin, **task.sidein}
+            outputs = {"stdout": task.stdout, "stderr": task.stderr, **task.sideout}
+            relayed = {
+                name: isinstance(channel, (SubprocessPipe, AnonChannel))
+                for name, channel in {**inputs, **outputs}.items()
+            }
+            modes = {
+                **{name: Mode(parent = "wb", child = "rb") for name in inputs if relayed[name]},
+                **{name: Mode(parent = "rb", child = "wb") for name in outputs if relayed[name]}
+            }
+            task.create_channels()
+            task.start(modes)
+        except Exception as e:
+            send({"spawned": id, "error": f"{type(e).__name__}: {e}"})
+            return
+
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.pending[token] = {
+                name: (task.channels[name].io, name in inputs)
+                for name, is_relayed in relayed.items() if is_relayed
+            }
+        tasks[id] = task
+        send({"spawned": id, "token": token, "pid": task.process.pid})
+
+        def reap():
+            returncode = task.process.wait()
+            tasks.pop(id, None)
+            try:
+                send({"exited": id, "returncode": returncode})
+            except OSError:
+                pass
+        Thread(target = reap, daemon = True).start()
+
+    def attach(self, conn: socket.socket, token: str, name: str):
+        "Relay one channel until either side closes"
+        with self.lock:
+            channels = self.pending[token]
+            io, is_input = channels.pop(name)
+            if not channels:
+                del self.pending[token]
+        # Spliced from a Unix socket, each write the Coordinator made takes
+        # a slot of the child's pipe, which then fills after 16 small ones
+        splice = conn.family != socket.AF_UNIX
+        try:
+            if is_input:
+                relay(conn.fileno(), io.fileno(), splice)
+            else:
+                relay(io.fileno(), conn.fileno(), splice)
+                conn.shutdown(socket.SHUT_WR)
+        except OSError:
+            # The child or the Coordinator went away. Closing both ends
+            # passes that on to the other.
+            pass
+        finally:
+            try:
+                io.close()
+            except OSError:
+                pass
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run subfeed tasks for remote Coordinators")
+    parser.add_argument("address", nargs = "?", default = "tcp://127.0.0.1:7070",
+                        help = "tcp://host:port (port 0 picks one) or unix:/path (default: tcp://127.0.0.1:7070)")
+    parser.add_argument("--key-file", help = f"file holding the shared key (default: ${KEY_ENV})")
+    args = parser.parse_args()
+    key = None
+    if args.key_file:
+        with open(args.key_file, "rb") as f:
+            key = f.read().strip()
+    try:
+        agent = Agent(args.address, key)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"listening on {agent.address}", flush = True)
+    agent.serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Iterable
+import asyncio
+import os
+from .sync_context import SyncContext, EOF
+from .chunk import Chunk
+from .task import TaskTemplate, Task
+from .writer import Writer
+from .channel import BROKEN_PIPE
+from .coordinator import WriterSpec
+
+@dataclass
+class AsyncCoordinator:
+    """
+    asyncio counterpart of Coordinator. Writer fds are non-blocking and
+    registered with the event loop, so a full pipe suspends the writing
+    coroutine instead of blocking a thread, and backpressure reaches the
+    caller through `await feed()`.
+
+        async with AsyncCoordinator(template, count=2, writer_specs=specs) as swarm:
+            await swarm.feed(batch)
+    """
+    # --- Configuration ---
+    template: TaskTemplate
+    count: int
+    writer_specs: Dict[str, WriterSpec]
+    bind_id: str = "id"
+
+    # Tuning Parameters
+    common_queue_multiplier: int = 10
+    writer_queue_maxsize: int = 2
+
+    # --- Internal State ---
+    common: asyncio.Queue = field(init=False)
+    tasks: List[Task] = field(init=False)
+    context: SyncContext = field(init=False)
+    # Each online task's Writers, by channel name
+    writers: List[Dict[str, Writer]] = field(init=False)
+    activations: List[asyncio.Task] = field(init=False)
+    pumps: List[asyncio.Task] = field(init=False)
+
+    # The first exception raised by a pump, which fails feed() and aclose()
+    error: BaseException | None = field(init=False)
+    failed: asyncio.Event = field(init=False)
+
+    def __post_init__(self):
+        self.tasks = [
+            Task.from_template(self.template, bind={self.bind_id: i})
+            for i in range(self.count)
+        ]
+        self.context = SyncContext()
+        self.writers = []
+        self.activations = []
+        self.pumps = []
+        self.error = None
+
+    async def _activate_node(self, task: Task, modes: Dict, writer_types: Dict, writer_options: Dict):
+        loop = asyncio.get_running_loop()
+
+        # 1. Start Process (fork/exec off the event loop)
+        await loop.run_in_executor(None, task.start, modes)
+
+        # 2. Create the channel Writers. They supply filter/encode and the
+        # channel io, and are driven by the pumps below, never started.
+        channels = {"stdin": task.stdin, **task.sidein}
+        exhaust_channels = self.exhaust_channels
+        writers = {
+            name: WriterType(
+                context = self.context,
+                io = channels[name].io,
+                ignore_broken_pipe = name not in exhaust_channels,
+                name = name,
+                **writer_options.get(name, {})
+            )
+            for name, WriterType in writer_types.items()
+        }
+        queues = {}
+        for name, writer in writers.items():
+            writer.io.flush()
+            os.set_blocking(writer.io.fileno(), False)
+            queues[name] = asyncio.Queue(maxsize = self.writer_queue_maxsize)
+            self._pump(self._write(writer, queues[name]))
+        self._pump(self._take(queues))
+
+        # 3. Register
+        self.writers.append(writers)
+
+    async def start(self):
+        """
+        Launches the tasks and returns as soon as one worker is online.
+        """
+        self.common = asyncio.Queue(maxsize = self.count * self.common_queue_multiplier)
+        self.failed = asyncio.Event()
+
+        for task in self.tasks:
+            task.create_channels()
+
+        modes = {name: spec.mode for name, spec in self.writer_specs.items()}
+        writer_types = {name: spec.type for name, spec in self.writer_specs.items()}
+        writer_options = {name: spec.options for name, spec in self.writer_specs.items()}
+
+        self.activations = [
+            asyncio.create_task(
+                self._activate_node(task, modes, writer_types, writer_options)
+            )
+            for task in self.tasks
+        ]
+
+        # Wait until at least one worker is online.
+        pending = set(self.activations)
+        while not self.writers:
+            if not pending:
+                raise RuntimeError("All workers failed to start!")
+            _, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+
+    async def feed(self, item):
+        await self._put(item)
+
+    async def feed_many(self, items: Iterable, chunk_size: int = 1024):
+        for chunk in Chunk.split(items, chunk_size):
+            await self.feed(chunk)
+
+    async def aclose(self):
+        # One EOF per task, queued behind the data. Tasks that never come
+        # online leave theirs in the queue.
+        try:
+            for _ in self.tasks:
+                await self._put(EOF)
+            await asyncio.gather(*self.activations, return_exceptions = True)
+            await asyncio.gather(*self.pumps)
+        except BaseException:
+            await self._abort()
+            raise
+        await self._reap()
+
+    async def _abort(self):
+        """
+        Cancel the pumps instead of draining them, then close every
+        channel so the children see EOF, and reap them.
+        """
+        await asyncio.gather(*self.activations, return_exceptions = True)
+        for pump in self.pumps:
+            pump.cancel()
+        await asyncio.gather(*self.pumps, return_exceptions = True)
+        for writers in self.writers:
+            for writer in writers.values():
+                try:
+                    writer.io.close()
+                except BROKEN_PIPE:
+                    pass
+        await self._reap()
+
+    async def _reap(self):
+        loop = asyncio.get_running_loop()
+        for task in self.tasks:
+            if task.process:
+                await loop.run_in_executor(None, task.process.wait)
+
+    async def _put(self, item):
+        "Queue item in the common queue, raising a pump's error while waiting"
+        if self.error is not None:
+            raise self.error
+        if not self.common.full():
+            self.common.put_nowait(item)
+            return
+        put = asyncio.ensure_future(self.common.put(item))
+        failed = asyncio.ensure_future(self.failed.wait())
+        try:
+            await asyncio.wait((put, failed), return_when = asyncio.FIRST_COMPLETED)
+        finally:
+            put.cancel()
+            failed.cancel()
+        if self.error is not None:
+            raise self.error
+
+    def _pump(self, coroutine):
+        pump = asyncio.create_task(coroutine)
+        pump.add_done_callback(self._pumped)
+        self.pumps.append(pump)
+
+    def _pumped(self, pump: asyncio.Task):
+        "Record the first pump to fail, waking any feed() waiting for room"
+        if pump.cancelled() or pump.exception() is None or self.error is not None:
+            return
+        self.error = pump.exception()
+        self.failed.set()
+
+    async def _take(self, queues: Dict[str, asyncio.Queue]):
+        while True:
+            batch = await self.common.get()
+
+            # Fan out to all writers
+            for queue in queues.values():
+                await queue.put(batch)
+
+            self.common.task_done()
+            if batch is EOF:
+                return
+
+    async def _write(self, writer: Writer, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        fd = writer.io.fileno()
+        broken = False
+        eof = False
+        while not eof:
+            outputs = []
+            size = 0
+            batch = await queue.get()
+            # Linger from the first batch's arrival, as Writer.gather does
+            deadline = loop.time() + writer.linger
+            while True:
+                if batch is EOF:
+                    eof = True
+                    queue.task_done()
+                    break
+                output = writer.encode(batch)
+                outputs.append(output)
+                size += len(output)
+                if size >= writer.coalesce_bytes:
+                    break
+                remaining = deadline - loop.time()
+                try:
+                    if remaining > 0:
+                        batch = await asyncio.wait_for(queue.get(), remaining)
+                    else:
+                        batch = queue.get_nowait()
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+
+            # After an ignored broken pipe, keep draining so _take never
+            # blocks on this channel.
+            if outputs and not broken:
+                try:
+                    await self._write_all(fd, writer.join(outputs))
+                except BrokenPipeError:
+                    if not writer.ignore_broken_pipe:
+                        raise
+                    broken = True
+            for _ in outputs:
+                queue.task_done()
+
+        # Close input to unblock processes that are waiting on EOF for it
+        try:
+            writer.io.close()
+        except BrokenPipeError:
+            if not writer.ignore_broken_pipe:
+                raise
+
+    @staticmethod
+    async def _write_all(fd: int, output):
+        if isinstance(output, str):
+            output = output.encode()
+        view = memoryview(output).cast("B")
+        while view:
+            try:
+                written = os.write(fd, view)
+            except BlockingIOError:
+                await AsyncCoordinator._writable(fd)
+                continue
+            view = view[written:]
+
+    @staticmethod
+    async def _writable(fd: int):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_writer(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_writer(fd)
+
+    @property
+    def exhaust_channels(self) -> List[str]:
+        return [
+            name for name, spec in self.writer_specs.items()
+            if spec.exhaust
+        ]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # On an error or cancellation there is nothing left to drain
+        if exc_type is None:
+            await self.aclose()
+        else:
+            await self._abort()
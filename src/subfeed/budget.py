@@ -0,0 +1,36 @@
+from threading import Condition
+
+class MemoryBudget:
+    """
+    Bytes held by fed batches and their encoded outputs, bounded by limit.
+    acquire() blocks feed() while a batch would exceed the limit; charge()
+    counts bytes that are already held, without waiting.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("memory budget must be at least 1 byte")
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.cond = Condition()
+
+    def acquire(self, size: int):
+        with self.cond:
+            # An oversized batch is admitted alone rather than never
+            while self.used > 0 and self.used + size > self.limit:
+                self.cond.wait()
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def charge(self, size: int):
+        with self.cond:
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def release(self, size: int):
+        if not size:
+            return
+        with self.cond:
+            self.used -= size
+            self.cond.notify_all()
@@ -8,7 +8,35 @@ import sys
 import os
 from abc import ABC, abstractmethod
 import io
+import socket
 from subprocess import Popen, PIPE
+from .shm import Ring, ShmWriter
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+def pipe_max_size() -> int:
+    "Largest pipe an unprivileged process may request"
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 1 << 20
+
+def set_pipe_size(fd: int, size: int) -> int | None:
+    """
+    Resize the pipe behind fd with F_SETPIPE_SZ, capped at pipe-max-size.
+    Returns the effective size, which is unchanged if the kernel refuses
+    (e.g. the per-user pipe limit is exhausted), or None where pipes cannot
+    be resized at all.
+    """
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return None
+    try:
+        return fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, min(size, pipe_max_size()))
+    except OSError:
+        return fcntl.fcntl(fd, fcntl.F_GETPIPE_SZ)
 
 @dataclass
 class Channel:
@@ -26,6 +54,10 @@ class Channel:
 class SubprocessPipe(Channel):
     name: Literal["stdin", "stdout", "stderr"]
 
+    # Requested and effective (after open) pipe buffer size in bytes
+    pipe_size: int | None = None
+    effective_pipe_size: int | None = field(init = False, default = None)
+
     def create(self):
         pass
 
@@ -35,14 +67,22 @@ class SubprocessPipe(Channel):
     def open(self, process: Popen, mode: str = None):
         if hasattr(process, self.name):
             self.io = getattr(process, self.name)
+            if self.pipe_size and self.io is not None:
+                self.effective_pipe_size = set_pipe_size(self.io.fileno(), self.pipe_size)
 
 @dataclass
 class AnonChannel(Channel):
     r: int = field(init=False)
     w: int = field(init = False)
 
+    # Requested and effective (after create) pipe buffer size in bytes
+    pipe_size: int | None = None
+    effective_pipe_size: int | None = field(init = False, default = None)
+
     def create(self):
         self.r, self.w = os.pipe()
+        if self.pipe_size:
+            self.effective_pipe_size = set_pipe_size(self.w, self.pipe_size)
 
     def init_process(self, mode: str = "r") -> int:
         if "w" in mode:
@@ -60,6 +100,90 @@ class AnonChannel(Channel):
         if close_other_fd:
             os.close(other_fd)
 
+@dataclass
+class ShmChannel(Channel):
+    """
+    Input channel backed by a shared-memory ring buffer of size bytes (see
+    subfeed.shm). Each filtered batch becomes one record, which the child
+    reads zero-copy with ShmReader.from_env(name). Sidein only, with the
+    threads engine.
+    """
+    size: int = 64 << 20
+    dir: str = "/dev/shm"
+    fd: int = field(init = False)
+    doorbell: tuple = field(init = False)
+    credit: tuple = field(init = False)
+
+    def create(self):
+        self.fd = Ring.create(self.size, self.dir)
+        self.doorbell = os.pipe()
+        self.credit = os.pipe()
+
+    def init_process(self, mode: str = "r"):
+        raise ValueError("ShmChannel can only be a sidein channel")
+
+    @property
+    def child_fds(self) -> tuple:
+        "Shared memory, doorbell read end and credit write end"
+        return self.fd, self.doorbell[0], self.credit[1]
+
+    def open(self, mode: str = "wb"):
+        self.io = ShmWriter(self.fd, doorbell = self.doorbell[1], credit = self.credit[0])
+        for fd in self.child_fds:
+            os.close(fd)
+
+# Errors writing to a channel whose reader has gone: a broken pipe, or a
+# socket reset by the agent relaying it
+BROKEN_PIPE = (BrokenPipeError, ConnectionResetError)
+
+def parse_address(address: str) -> tuple[int, Any]:
+    "Socket family and address for 'tcp://host:port' or 'unix:/path'"
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return socket.AF_INET6 if ":" in host else socket.AF_INET, (host.strip("[]"), int(port))
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):].removeprefix("//")
+    raise ValueError(f"expected tcp://host:port or unix:/path, not {address!r}")
+
+def connect(address: str, buffer_size: int | None = None) -> socket.socket:
+    "Connect a stream socket, with Nagle off and optional buffer sizes"
+    family, addr = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    if buffer_size:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+    sock.connect(addr)
+    if family != socket.AF_UNIX:
+        # Writers already coalesce; each flush should leave at once
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+@dataclass
+class SocketChannel(Channel):
+    """
+    Parent end of a TCP or Unix domain stream connection to address,
+    sending hello first. Remote tasks use one per relayed channel (see
+    subfeed.agent). A closed peer surfaces as BrokenPipeError or
+    ConnectionResetError on write.
+    """
+    address: str
+    hello: bytes = b""
+
+    # Requested socket buffer size in bytes, like a pipe's pipe_size
+    pipe_size: int | None = None
+
+    def create(self):
+        pass
+
+    def init_process(self, mode: str = "r"):
+        raise ValueError("a SocketChannel is not connected to a local process")
+
+    def open(self, mode: str = "wb"):
+        sock = connect(self.address, self.pipe_size)
+        if self.hello:
+            sock.sendall(self.hello)
+        self.io = os.fdopen(sock.detach(), mode)
+
 @dataclass
 class HandleChannel(Channel):
     io: IO
@@ -73,15 +197,36 @@ class HandleChannel(Channel):
     def open(self, mode: str = "r"):
         return self.io
 
+@dataclass
+class FdChannel(Channel):
+    "An fd of this process handed to the child as is, e.g. 1 to share stdout"
+    fd: int
+
+    def create(self):
+        pass
+
+    def init_process(self, mode: str = "r") -> int:
+        return self.fd
+
+    def open(self, mode: str = "r"):
+        self.io = None
+
 @dataclass
 class PathChannel(Channel):
     path: str
 
+@dataclass
 class FileChannel(PathChannel):
+    # Open for appending instead of truncating, e.g. for a respawned Task
+    append: bool = False
+
     def create(self):
-        open(self.path, "w")
+        if not self.append:
+            open(self.path, "w").close()
 
     def init_process(self, mode: str = "r"):
+        if self.append:
+            mode = mode.replace("w", "a")
         return open(self.path, mode)
 
     def open(self, mode: str = "r"):
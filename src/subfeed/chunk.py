@@ -0,0 +1,198 @@
+from itertools import islice
+from typing import Iterable, Iterator, Any, List, Tuple, IO
+from dataclasses import dataclass
+import mmap
+import os
+import select
+import stat
+import struct
+from .rawio import FileRegion
+
+class Chunk(list):
+    """
+    A run of records that travels through the common and writer queues as
+    a single item. Writers still filter each record individually.
+    """
+
+    @staticmethod
+    def split(items: Iterable[Any], chunk_size: int) -> Iterator["Chunk"]:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        items = iter(items)
+        while True:
+            chunk = Chunk(islice(items, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+# Length prefix formats for Block framing, by prefix size in bytes
+PREFIXES = {1: ">B", 2: ">H", 4: ">I", 8: ">Q"}
+
+class Block(bytes):
+    """
+    Whole records read by feed_from(), kept in their original framing as
+    one bytes object rather than one object per record. delimiter is the
+    bytes following each record, or the size of the big-endian length
+    prefix preceding it. Travels through the queues like a Chunk.
+    """
+    def __new__(cls, data, num_records: int | None, delimiter: bytes | int):
+        block = super().__new__(cls, data)
+        block.num_records = num_records
+        block.delimiter = delimiter
+        return block
+
+    def __reduce__(self):
+        return Block, (bytes(self), self.num_records, self.delimiter)
+
+    def records(self) -> List[bytes]:
+        "Split into record payloads, without delimiters or length prefixes"
+        if isinstance(self.delimiter, bytes):
+            records = self.split(self.delimiter)
+            if self.endswith(self.delimiter):
+                records.pop()
+            return records
+        prefix = struct.Struct(PREFIXES[self.delimiter])
+        records = []
+        pos = 0
+        while pos < len(self):
+            start = pos + prefix.size
+            pos = start + prefix.unpack_from(self, pos)[0]
+            records.append(self[start:pos])
+        return records
+
+def record_count(batch: Any) -> int:
+    "Records in a batch: a Chunk's length, a Block's count, else 1"
+    match batch:
+        case Chunk(): return len(batch)
+        case Block(): return batch.num_records
+        case _: return 1
+
+def default_sizer(item: Any) -> int:
+    "Estimated bytes for an item: len() of bytes-like and str, else 1"
+    match item:
+        case Chunk(): return sum(default_sizer(record) for record in item)
+        case memoryview(): return item.nbytes
+        case bytes() | bytearray() | str(): return len(item)
+        case _: return 1
+
+@dataclass
+class Splitter:
+    "Cuts input into Blocks of whole records of about chunk_bytes each"
+    delimiter: bytes | int = b"\n"
+    chunk_bytes: int = 1 << 20
+
+    def __post_init__(self):
+        if self.chunk_bytes < 1:
+            raise ValueError("chunk_bytes must be at least 1")
+        match self.delimiter:
+            case bytes() if self.delimiter: self.prefix = None
+            case int() if self.delimiter in PREFIXES:
+                self.prefix = struct.Struct(PREFIXES[self.delimiter])
+            case _: raise ValueError("delimiter must be non-empty bytes or a prefix size of 1, 2, 4 or 8")
+
+    def read(self, fd: int) -> Iterator[Block]:
+        """
+        Yield Blocks from fd until EOF. Regular files are mapped into
+        memory from the current offset. Other fds are read in whatever
+        amounts are immediately available, up to chunk_bytes, so a slow
+        stream is not held back waiting for a full block.
+        """
+        info = os.fstat(fd)
+        offset = os.lseek(fd, 0, os.SEEK_CUR) if stat.S_ISREG(info.st_mode) else 0
+        if stat.S_ISREG(info.st_mode) and info.st_size > offset:
+            with mmap.mmap(fd, 0, access = mmap.ACCESS_READ) as buffer:
+                yield from self.blocks(buffer, offset, final = True)
+            return
+
+        # Read up to chunk_bytes past any incomplete record left over, so
+        # a record longer than chunk_bytes still completes
+        buffer = b""
+        eof = False
+        # poll rather than select, which fails for fds of 1024 and up
+        poll = select.poll()
+        poll.register(fd, select.POLLIN)
+        while not eof:
+            reads = [buffer]
+            size = 0
+            while size < self.chunk_bytes:
+                data = os.read(fd, self.chunk_bytes - size)
+                if not data:
+                    eof = True
+                    break
+                reads.append(data)
+                size += len(data)
+                if not poll.poll(0):
+                    break
+            buffer = b"".join(reads)
+            yield from self.blocks(buffer, 0, final = eof)
+            buffer = buffer[self.consumed:]
+
+    def regions(self, fd: int) -> Iterator[FileRegion]:
+        """
+        Yield FileRegions of whole records of the regular file fd, from its
+        current offset. Only the cut points are read, through a mapping;
+        Writers splice the records into pipes without copying them.
+        """
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+        if os.fstat(fd).st_size <= offset:
+            return
+        with mmap.mmap(fd, 0, access = mmap.ACCESS_READ) as buffer:
+            while offset < len(buffer):
+                end, _ = self.cut(buffer, offset, final = True)
+                if end == offset:
+                    raise ValueError("truncated length-prefixed record at end of input")
+                yield FileRegion(fd, offset, end - offset)
+                offset = end
+
+    def blocks(self, buffer, start: int = 0, final: bool = True) -> Iterator[Block]:
+        """
+        Yield Blocks from buffer, setting consumed to where the rest starts.
+        Unless final, an incomplete trailing record is left unconsumed.
+        """
+        self.consumed = start
+        delimiter = self.delimiter
+        with memoryview(buffer) as view:
+            while self.consumed < len(buffer):
+                end, count = self.cut(buffer, self.consumed, final)
+                if end == self.consumed:
+                    if final:
+                        raise ValueError("truncated length-prefixed record at end of input")
+                    return
+                # One copy, straight from the buffer or mapping
+                block = Block(view[self.consumed:end], count, delimiter)
+                if count is None:
+                    block.num_records = block.count(delimiter) + (not block.endswith(delimiter))
+                yield block
+                self.consumed = end
+
+    def cut(self, buffer, start: int, final: bool) -> Tuple[int, int | None]:
+        """
+        End of the last whole record within chunk_bytes of start, and the
+        number of records up to it if known without scanning again.
+        """
+        limit = start + self.chunk_bytes
+        if self.prefix is not None:
+            return self.cut_prefixed(buffer, start, limit)
+
+        delimiter = self.delimiter
+        if limit >= len(buffer) and final:
+            return len(buffer), None
+        i = buffer.rfind(delimiter, start, min(limit, len(buffer)))
+        if i < 0:
+            # A record longer than chunk_bytes goes in a block of its own
+            i = buffer.find(delimiter, limit)
+        if i < 0:
+            return (len(buffer) if final else start), None
+        return i + len(delimiter), None
+
+    def cut_prefixed(self, buffer, start: int, limit: int) -> Tuple[int, int]:
+        prefix = self.prefix
+        pos = start
+        count = 0
+        while pos + prefix.size <= len(buffer):
+            next = pos + prefix.size + prefix.unpack_from(buffer, pos)[0]
+            if next > len(buffer) or (next > limit and count):
+                break
+            pos = next
+            count += 1
+        return pos, count
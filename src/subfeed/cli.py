@@ -0,0 +1,165 @@
+"""
+Command line: stream stdin or files to N persistent copies of a command,
+in blocks of whole records, like `parallel --pipe`.
+
+    subfeed -j 8 -o 'out.{id}.tsv' -- sort -k2
+    subfeed -j 4 --block 4M -i records.bin -d '\\0' -- ./decode.sh
+    zcat logs.gz | subfeed -j 16 -- 'grep -c ERROR'
+
+Each block goes to whichever copy is ready first. Regular files (and a
+regular file on stdin) are cut at record boundaries through a memory
+mapping and spliced into the pipes, so the data never passes through
+Python. `{id}` in the command and in output paths is the copy's number.
+"""
+import argparse
+import os
+import stat
+import sys
+from typing import List
+from .channel import FdChannel, FileChannel
+from .chunk import Splitter
+from .coordinator import Coordinator, WriterSpec
+from .task import TaskTemplate, Mode
+from .writer import Writer
+
+SUFFIXES = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+def size(text: str) -> int:
+    "Byte count with an optional K, M or G suffix"
+    number, suffix = text[:-1], text[-1:].upper()
+    if suffix not in SUFFIXES:
+        number, suffix = text, ""
+    try:
+        value = int(number) * SUFFIXES[suffix]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return value
+
+def delimiter(text: str) -> bytes:
+    "Delimiter with backslash escapes, e.g. '\\0' or '\\n>'"
+    value = text.encode().decode("unicode_escape").encode("latin-1")
+    if not value:
+        raise argparse.ArgumentTypeError("delimiter must not be empty")
+    return value
+
+def side(text: str) -> tuple[str, str]:
+    name, _, path = text.partition("=")
+    if not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=PATH, not {text!r}")
+    return name, path
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog = "subfeed",
+        description = "Stream input in blocks of whole records to persistent copies of a command."
+    )
+    parser.add_argument("command", nargs = argparse.REMAINDER,
+                        help = "command to run, as one shell string or as words after --")
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count(),
+                        help = "number of copies (default: CPU count)")
+    parser.add_argument("-i", "--input", action = "append", default = [],
+                        help = "input file, in order (repeatable; default: stdin)")
+    parser.add_argument("-b", "--block", type = size, default = 1 << 20,
+                        help = "block size, e.g. 512K or 4M (default: 1M)")
+    framing = parser.add_mutually_exclusive_group()
+    framing.add_argument("-d", "--delimiter", type = delimiter, default = b"\n",
+                         help = "delimiter ending each record, with escapes (default: \\n)")
+    framing.add_argument("--prefix", type = int, choices = (1, 2, 4, 8),
+                         help = "records are framed by a big-endian length prefix of this many bytes")
+    parser.add_argument("-o", "--output", help = "stdout file of each copy, e.g. out.{id} (default: shared stdout)")
+    parser.add_argument("-e", "--error", help = "stderr file of each copy (default: shared stderr)")
+    parser.add_argument("-s", "--side", type = side, action = "append", default = [], metavar = "NAME=PATH",
+                        help = "output side channel: a file, e.g. stats.{id}, whose fd is in $NAME (repeatable)")
+    parser.add_argument("--pipe-size", type = size, help = "pipe buffer size for each copy's stdin")
+    parser.add_argument("--engine", choices = ("threads", "epoll"), default = "threads")
+    parser.add_argument("--dispatch", choices = ("shared", "round_robin", "least_bytes", "writable"),
+                        default = "shared")
+    parser.add_argument("--agent", action = "append", metavar = "ADDRESS",
+                        help = "run copies on subfeed agents in turn, with the key in $SUBFEED_AGENT_KEY "
+                               "(repeatable; 'local' for this host)")
+    parser.add_argument("--pin", choices = ("cpu", "numa"), help = "pin each copy to one CPU or NUMA node in turn")
+    parser.add_argument("--coordinator-cpus", metavar = "CPUS",
+                        help = "cpulist of CPUs kept for subfeed's own threads, e.g. 0-1")
+    parser.add_argument("--nice", type = int, help = "nice value of the copies")
+    parser.add_argument("--daemonize", action = "store_true",
+                        help = "detach from the terminal, still reading stdin")
+    parser.add_argument("--log", default = "/dev/null", help = "stdout and stderr when daemonized")
+    return parser
+
+def command(words: List[str]) -> str | List[str]:
+    "One word is a command string, for the shell if it needs one"
+    if words and words[0] == "--":
+        words = words[1:]
+    return words[0] if len(words) == 1 else words
+
+def main(argv: List[str] | None = None) -> int:
+    args = parser().parse_args(argv)
+    words = command(args.command)
+    if not words:
+        parser().error("missing command")
+    if args.jobs < 1:
+        parser().error("--jobs must be at least 1")
+    if args.agent and not args.output:
+        parser().error("--agent needs --output, as remote copies cannot share stdout")
+
+    template = TaskTemplate(
+        args = words,
+        stdout = FileChannel(args.output) if args.output else FdChannel(1),
+        stderr = FileChannel(args.error) if args.error else FdChannel(2),
+        sideout = {name: FileChannel(path) for name, path in args.side},
+        pipe_size = args.pipe_size,
+        nice = args.nice
+    )
+    swarm = Coordinator(
+        template,
+        count = args.jobs,
+        # A copy that exits early (e.g. head) drops the blocks handed to it
+        writer_specs = {"stdin": WriterSpec(
+            Writer, mode = Mode(parent = "wb", child = "rb"), raw = True, ignore_broken_pipe = True
+        )},
+        daemonize = args.daemonize,
+        log_file = args.log,
+        engine = args.engine,
+        dispatch = args.dispatch,
+        pin = args.pin,
+        coordinator_cpus = args.coordinator_cpus,
+        agents = [None if agent == "local" else agent for agent in args.agent] if args.agent else None
+    )
+    framing = args.prefix or args.delimiter
+    splitter = Splitter(framing, args.block)
+
+    # Inputs stay open until close(), as Writers splice from them
+    opened = []
+    try:
+        with swarm:
+            for source in args.input or [0]:
+                # 1. Open the input; stdin may have been moved by daemonizing
+                if source == 0:
+                    fd = swarm.stdin.fileno() if swarm.stdin else 0
+                else:
+                    fd = os.open(source, os.O_RDONLY)
+                    opened.append(fd)
+
+                # 2. Splice regular files; the epoll engine needs bytes
+                if stat.S_ISREG(os.fstat(fd).st_mode) and args.engine == "threads":
+                    for region in splitter.regions(fd):
+                        swarm.feed(region)
+                else:
+                    swarm.feed_from(fd, framing, args.block)
+    finally:
+        for fd in opened:
+            os.close(fd)
+
+    # 3. Report failed copies
+    failed = 0
+    for task in swarm.tasks:
+        if task.process is not None and task.process.returncode:
+            print(f"subfeed: copy {task.bind[swarm.bind_id]} exited with {task.process.returncode}",
+                  file = sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
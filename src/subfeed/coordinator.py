@@ -1,14 +1,31 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Type, IO
-from threading import Thread
+from typing import List, Dict, Type, IO, Any, Iterable, Iterator, Literal, Callable
+from threading import Thread, Lock, Event, Condition
+from concurrent.futures import Executor, ProcessPoolExecutor
+from collections import deque
+import multiprocessing
 from queue import Queue
 import time
+from time import perf_counter
 import os
 import sys
-from .sync_context import SyncContext
+from .sync_context import SyncContext, EOF, requeue
+from .chunk import Chunk, Splitter, record_count
 from .task import TaskTemplate, Task, Mode
 from .worker import Worker
-from .writer import Writer
+from .engine import SelectorEngine
+from .writer import Writer, Encoded, Broadcast, encode
+from .reader import Reader, Result
+from .reorder import Reorder, Sequenced
+from .stats import Stats, ChannelStats, ScalingEvent, Failure
+from .channel import FileChannel, ShmChannel
+from .dispatch import Dispatcher, Partitioned, POLICIES, default_sizer
+from .placement import available_cpus, parse_cpus, plan, pinned
+from .budget import MemoryBudget
+from .trace import Tracer, Traced, untraced
+
+# Ends a session's results in results_queue
+SESSION = object()
 
 @dataclass
 class WriterSpec:
@@ -16,6 +33,48 @@ class WriterSpec:
     exhaust: bool = True
     mode: Mode = field(default_factory = Mode)
 
+    # Throughput/latency trade-off (see Writer.gather). The defaults write
+    # and flush each batch as soon as it arrives.
+    coalesce_bytes: int = 0
+    linger: float = 0.
+
+    # Encode this channel in the Coordinator's filter pool, keeping up to
+    # pool_depth batches in flight. Requires a picklable Writer type.
+    offload: bool = False
+    pool_depth: int = 4
+
+    # Write with os.writev on the channel's fd (see Writer.emit)
+    raw: bool = False
+
+    # Bytes an encoded output holds against Coordinator.memory_budget
+    sizer: Callable[[Any], int] = default_sizer
+
+    # Drop this channel's batches, rather than raise, once its child stops
+    # reading. Always the case when exhaust is False or under restart.
+    ignore_broken_pipe: bool = False
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        "Keyword arguments forwarded to the Writer constructor"
+        return {
+            "coalesce_bytes": self.coalesce_bytes,
+            "linger": self.linger,
+            "pool_depth": self.pool_depth,
+            "raw": self.raw,
+            "sizer": self.sizer
+        }
+
+@dataclass
+class ReaderSpec:
+    type: Type[Reader] = Reader
+    mode: Mode = field(default_factory = lambda: Mode(parent = "rb", child = "wb"))
+    delimiter: bytes = b"\n"
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        "Keyword arguments forwarded to the Reader constructor"
+        return {"delimiter": self.delimiter}
+
 @dataclass
 class Coordinator:
     # --- Configuration ---
@@ -23,8 +82,99 @@ class Coordinator:
     count: int
     writer_specs: Dict[str, WriterSpec]
     daemonize: bool = False
+    # Where a daemonized Coordinator's stdout and stderr go
+    log_file: str = "/dev/null"
     bind_id: str = "id"
 
+    # "threads" runs one thread per Worker and per Writer. "epoll" drives
+    # every writer fd from a single selector loop with non-blocking writes.
+    engine: Literal["threads", "epoll"] = "threads"
+
+    # Output channels (stdout, stderr or sideout) to parse into Results.
+    # Results go to on_result if given, else to the results() iterator.
+    reader_specs: Dict[str, ReaderSpec] = field(default_factory = dict)
+    on_result: Callable[[Result], Any] | None = None
+    results_maxsize: int = 0
+
+    # Ordered mode: yield results in input order. Requires exactly one
+    # reader whose subprocess emits one record per input record. feed()
+    # blocks while reorder_limit records are awaiting their result.
+    ordered: bool = False
+    reorder_limit: int = 10_000
+
+    # How fed items reach workers. "shared" lets every worker pull from the
+    # common queue. The other policies (or a Dispatcher instance) route
+    # each item to one worker's inbox, sized to its measured drain rate.
+    dispatch: Literal["shared", "round_robin", "least_bytes", "writable"] | Dispatcher = "shared"
+
+    # Key-affinity routing: items with equal key(item) always go to the
+    # same task (see Partitioned). Implies Partitioned dispatch.
+    key: Callable[[Any], Any] | None = None
+
+    # Process pool for WriterSpecs with offload=True: a worker count, or an
+    # Executor to share. 0 sizes the pool to the CPU count.
+    filter_pool: int | Executor = 0
+
+    # Instrumentation: counters behind stats(), and an optional callback
+    # receiving a Stats snapshot every stats_interval seconds.
+    metrics: bool = True
+    stats_interval: float = 0.
+    on_stats: Callable[[Stats], Any] | None = None
+
+    # Elastic pool: between min_count and max_count tasks (both default to
+    # count), starting at count. A task is added when the common queue
+    # stays at least half full for scale_up_after seconds, and one retires
+    # when it stays empty for scale_down_after seconds. Shared dispatch only.
+    min_count: int | None = None
+    max_count: int | None = None
+    scale_up_after: float = 1.
+    scale_down_after: float = 10.
+    scale_interval: float = 0.1
+
+    # Supervision: check every supervise_interval for tasks that died before
+    # close() and respawn them with the same bind, at most max_restarts
+    # times per restart_window seconds each. Batches not yet written to
+    # every channel of the dead task are replayed to the others: all of
+    # them under "at_least_once" (some may be processed twice), or only
+    # those no channel had started writing under "at_most_once". Batches
+    # already in its pipes are lost with it. Shared dispatch only.
+    restart: bool = False
+    delivery: Literal["at_least_once", "at_most_once"] = "at_least_once"
+    max_restarts: int = 3
+    restart_window: float = 60.
+    supervise_interval: float = 0.1
+
+    # Remote tasks: task i runs on agents[i % len(agents)], where None is
+    # this host and an address is a subfeed agent (see subfeed.agent).
+    # Overrides TaskTemplate.agent.
+    agents: List[str | None] | None = None
+
+    # Placement: task i is pinned to the (i % n)th of n CPU sets, one CPU
+    # each under "cpu" or one NUMA node each under "numa", taken from the
+    # CPUs outside coordinator_cpus. coordinator_cpus (a cpulist, CPU
+    # numbers, or a count of CPUs to take first) pins the threads the
+    # Coordinator starts, and tasks then default to the other CPUs. Local
+    # tasks only; TaskTemplate.cpus sets CPUs for every task instead.
+    pin: Literal["cpu", "numa"] | None = None
+    coordinator_cpus: int | str | Iterable[int] | None = None
+
+    # Warm pools: keep tasks running across jobs, ending each with
+    # end_session(), which writes this marker to every task.
+    session_marker: bytes | None = None
+
+    # Memory bound in bytes, replacing the item limit of the common queue.
+    # A fed batch holds sizer(item) bytes from feed() until every channel
+    # has encoded it, and each encoded output holds WriterSpec.sizer bytes
+    # until written. feed() blocks while the budget would be exceeded.
+    memory_budget: int | None = None
+    sizer: Callable[[Any], int] = default_sizer
+
+    # Tracing: stamp this fraction of fed batches at each stage of their
+    # way to the children, keeping the latest trace_limit traces in
+    # tracer for export() to a timeline or histograms(). 0 disables it.
+    trace_rate: float = 0.
+    trace_limit: int = 100_000
+
     # Tuning Parameters
     common_queue_multiplier: int = 10
     writer_queue_maxsize: int = 2  # <--- CRITICAL: Prevents stealing
@@ -34,26 +184,169 @@ class Coordinator:
     tasks: List[Task] = field(init=False)
     workers: List[Worker] = field(init=False)
     startup_threads: List[Thread] = field(init=False)
+    io_engine: SelectorEngine | None = field(init=False)
+    results_queue: Queue = field(init=False)
+    reorder: Reorder | None = field(init=False)
+    dispatcher: Dispatcher | None = field(init=False)
+    pool: Executor | None = field(init=False)
+    stats_thread: Thread | None = field(init=False)
+    scale_thread: Thread | None = field(init=False)
+    scaling_events: List[ScalingEvent] = field(init=False)
+    supervise_thread: Thread | None = field(init=False)
+    failures: List[Failure] = field(init=False)
+    tracer: Tracer | None = field(init=False)
 
     def __post_init__(self):
+        if self.engine not in ("threads", "epoll"):
+            raise ValueError(f"Unknown engine {self.engine!r}")
+        for name in self.reader_specs:
+            if name not in self.template.outputs:
+                raise ValueError(f"reader {name} is not an output channel of the template")
+        if self.engine == "epoll" and any(
+            isinstance(channel, ShmChannel) for channel in self.template.sidein.values()
+        ):
+            raise ValueError("ShmChannel requires the threads engine")
+        for name, channel in self.template.sidein.items():
+            spec = self.writer_specs.get(name)
+            # The ring frames one record per write, which joined or raw
+            # writes would break
+            if isinstance(channel, ShmChannel) and spec is not None:
+                if spec.coalesce_bytes > 0:
+                    raise ValueError(f"ShmChannel {name} does not support coalesce_bytes")
+                if spec.raw:
+                    raise ValueError(f"ShmChannel {name} does not support raw writes")
+        if self.engine == "epoll" and any(spec.offload for spec in self.writer_specs.values()):
+            raise ValueError("offload requires the threads engine")
+        if self.ordered and len(self.reader_specs) != 1:
+            raise ValueError("ordered mode requires exactly one reader_spec")
+
+        if self.key is not None:
+            if self.dispatch != "shared":
+                raise ValueError("key routing cannot be combined with another dispatch policy")
+            self.dispatch = Partitioned(min_depth = self.writer_queue_maxsize, key = self.key)
+
+        match self.dispatch:
+            case "shared": self.dispatcher = None
+            case Dispatcher(): self.dispatcher = self.dispatch
+            case str() if self.dispatch in POLICIES:
+                self.dispatcher = POLICIES[self.dispatch](
+                    min_depth = self.writer_queue_maxsize
+                )
+            case _: raise ValueError(f"Unknown dispatch policy {self.dispatch!r}")
+
+        if self.min_count is None:
+            self.min_count = self.count
+        if self.max_count is None:
+            self.max_count = self.count
+        if not 1 <= self.min_count <= self.count <= self.max_count:
+            raise ValueError("expected 1 <= min_count <= count <= max_count")
+        if self.elastic and self.dispatcher is not None:
+            raise ValueError("autoscaling requires shared dispatch")
+        if self.restart and self.dispatcher is not None:
+            raise ValueError("restart requires shared dispatch")
+        if self.restart and self.ordered:
+            raise ValueError("restart is not supported in ordered mode")
+        if self.delivery not in ("at_least_once", "at_most_once"):
+            raise ValueError(f"Unknown delivery policy {self.delivery!r}")
+        if self.pin is not None and self.template.cpus is not None:
+            raise ValueError("pin cannot be combined with TaskTemplate.cpus")
+
+        # 0. CPU placement
+        match self.coordinator_cpus:
+            case None: self.reserved_cpus = set()
+            case int(): self.reserved_cpus = set(sorted(available_cpus())[:self.coordinator_cpus])
+            case _: self.reserved_cpus = parse_cpus(self.coordinator_cpus)
+        self.task_cpus = plan(self.pin, self.reserved_cpus)
+
         # 1. Common Queue (The "Pool")
         # Large enough to absorb stdin bursts, but not infinite
         maxsize = self.count * self.common_queue_multiplier
+        self.budget = None
+        if self.memory_budget is not None:
+            self.budget = MemoryBudget(self.memory_budget)
+            maxsize = 0
         self.context = SyncContext(Queue(maxsize=maxsize))
+        self.tracer = Tracer(self.trace_rate, self.trace_limit) if self.trace_rate else None
 
-        self.tasks = [
-            Task.from_template(self.template, bind={self.bind_id: i})
-            for i in range(self.count)
-        ]
+        self.tasks = [self._task(i) for i in range(self.count)]
         self.workers = []
         self.startup_threads = []
+        self.launcher = None
+        self.online = Condition()
+        self.launching = 0
+        self.io_engine = None
+        self.pool = None
+        self.fed = 0
+        self.feed_time = 0.
+        self.stats_thread = None
+        self.stats_stop = Event()
+        self.scale_thread = None
+        self.scale_stop = Event()
+        self.scaling_events = []
+        self.retiring = 0
+        self.supervise_thread = None
+        self.supervise_stop = Event()
+        self.failures = []
+        self.restarts: Dict[Any, deque] = {}
+        self.stdin = None
+        self.retained: List[Broadcast] = []
+        self.broadcast_lock = Lock()
+        self.sessions = 0
+        self.session_echo = Condition()
+
+        # Routed dispatch: one inbox per task, keyed by its bind_id value
+        self.inboxes = {}
+        if self.dispatcher is not None:
+            self.inboxes = {task.bind[self.bind_id]: Queue() for task in self.tasks}
+        if isinstance(self.dispatcher, Partitioned):
+            self.dispatcher.partition(list(self.inboxes.values()))
+        self.results_queue = Queue(maxsize=self.results_maxsize)
+        self.open_readers = self.count * len(self.reader_specs)
+        self.readers_lock = Lock()
+        if self.open_readers == 0:
+            self.results_queue.put(None)
+        self.reorder = None
+        if self.ordered:
+            self.reorder = Reorder(self._deliver, self.reorder_limit)
+
+    def _task(self, id: int) -> Task:
+        """
+        Task id from the template, placed on agents[id % len(agents)] if
+        given, else on its share of the CPUs
+        """
+        task = Task.from_template(self.template, bind={self.bind_id: id})
+        if self.agents:
+            task.agent = self.agents[id % len(self.agents)]
+        if self.task_cpus and task.agent is None and task.cpus is None:
+            task.cpus = self.task_cpus[id % len(self.task_cpus)]
+        return task
+
+    def _launch(self, *args):
+        "Startup thread body: bring a node online, then wake start()"
+        try:
+            self._activate_node(*args)
+        finally:
+            with self.online:
+                self.launching -= 1
+                self.online.notify_all()
 
-    def _activate_node(self, task: Task, modes: Dict, writer_types: Dict):
+    def _activate_node(
+            self, 
+            task: Task, 
+            modes: Dict, 
+            writer_types: Dict, 
+            writer_options: Dict
+        ):
         """
         Runs in a background thread. Tries to bring a node online.
         """
         # 1. Start Process
-        task.start(modes)
+        try:
+            task.start(modes)
+        except BaseException:
+            for _ in self.reader_specs:
+                self._reader_eof()
+            raise
 
         # 2. Create Worker
         # Clamp maxsize to prevent a fast-initializing worker from
@@ -63,84 +356,610 @@ class Coordinator:
             self.context, 
             task, 
             writer_types,
-            maxsize=self.writer_queue_maxsize
+            maxsize=self.writer_queue_maxsize,
+            writer_options=writer_options,
+            source=self.inboxes.get(task.bind[self.bind_id])
         )
 
-        # Ignore BrokenPipeError if channel does not need to be exhausted
+        # Ignore BrokenPipeError if channel does not need to be exhausted,
+        # or if the supervisor will recover from it
         exhaust_channels = self.exhaust_channels
+        if self.restart:
+            worker.log = deque()
+        if self.budget is not None:
+            worker.budget = self.budget
+            worker.sizer = self.sizer
         for name, writer in worker.writers.items():
-            writer.ignore_broken_pipe = name not in exhaust_channels
-        
-        
-        worker.start()
-        
-        # 3. Register
-        self.workers.append(worker)
+            writer.exhaust = name in exhaust_channels
+            writer.ignore_broken_pipe = (
+                self.restart or not writer.exhaust or self.writer_specs[name].ignore_broken_pipe
+            )
+            if self.dispatcher is not None:
+                writer.on_written = self.dispatcher.notify
+            if self.writer_specs[name].offload:
+                writer.pool = self.pool
+            if self.metrics:
+                writer.stats = ChannelStats()
+            if self.budget is not None:
+                writer.budget = self.budget
+                writer.on_encoded = worker.release
+
+        for name, spec in self.reader_specs.items():
+            marker = None
+            if self.session_marker is not None:
+                marker = self.session_marker.removesuffix(spec.delimiter)
+            worker.readers[name] = spec.type(
+                io = task.outputs[name].io,
+                sink = self._sink(task, name, worker),
+                on_eof = self._reader_eof,
+                marker = marker,
+                on_marker = self._echoed,
+                **spec.options
+            )
+
+        # 3. Start and register. A late joiner under shared dispatch gets
+        # the retained broadcasts first (routed ones wait in its inbox).
+        with self.broadcast_lock:
+            if self.dispatcher is None and self.retained:
+                worker.preload(self.retained)
+            # Sessions ended before it came online need no echo
+            for reader in worker.readers.values():
+                reader.sessions = self.sessions
+            if self.io_engine is not None:
+                worker.start_readers()
+                self.io_engine.add(worker)
+            else:
+                worker.start()
+            self.workers.append(worker)
+        if self.dispatcher is not None:
+            self.dispatcher.add(worker)
 
     def start(self):
         """
         Launches startup threads and returns AS SOON AS the system is viable.
         """
+        # Every thread started from here on inherits coordinator_cpus
+        with pinned(self.reserved_cpus):
+            self._start()
+
+    def _start(self):
         # 1. Create Channels
         for task in self.tasks:
             task.create_channels()
 
         # 1.5 Daemonize (Optional)
         if self.daemonize:
-            self._daemonize()
+            self._daemonize(self.log_file)
 
         # 2. Prepare Config
-        modes = {name: spec.mode for name, spec in self.writer_specs.items()}
+        modes = {
+            name: spec.mode 
+            for name, spec in {**self.writer_specs, **self.reader_specs}.items()
+        }
         writer_types = {name: spec.type for name, spec in self.writer_specs.items()}
+        writer_options = {name: spec.options for name, spec in self.writer_specs.items()}
+        self.node_config = (modes, writer_types, writer_options)
+
+        if any(spec.offload for spec in self.writer_specs.values()):
+            match self.filter_pool:
+                case Executor(): self.pool = self.filter_pool
+                case int():
+                    self.pool = ProcessPoolExecutor(
+                        max_workers = self.filter_pool or None,
+                        mp_context = multiprocessing.get_context("forkserver")
+                    )
+
+        if self.on_stats is not None and self.stats_interval > 0:
+            self.stats_thread = Thread(target=self._report, daemon=True)
+            self.stats_thread.start()
+
+        if self.engine == "epoll":
+            self.io_engine = SelectorEngine(self.context)
+            self.io_engine.start()
 
         # 3. Fire and Forget (mostly)
+        # A launcher thread creates the startup threads, so the first node
+        # can come online without waiting for the rest to be created.
         self.startup_threads = []
-        for task in self.tasks:
-            t = Thread(
-                target=self._activate_node, 
-                args=(task, modes, writer_types),
-                daemon=True
-            )
-            t.start()
-            self.startup_threads.append(t)
+        with self.online:
+            self.launching += len(self.tasks)
+        self.launcher = Thread(target=self._spawn_all, args=(list(self.tasks),), daemon=True)
+        self.launcher.start()
 
         # 4. The "Viability" Latch
-        # Wait until at least one worker is online.
-        while len(self.workers) == 0:
-            # Check if all startup threads died without success
-            if not any(t.is_alive() for t in self.startup_threads):
-                raise RuntimeError("All workers failed to start!")
-            time.sleep(0.01)
-        
+        # Wait until at least one worker is online, or all have failed.
+        with self.online:
+            self.online.wait_for(lambda: self.workers or not self.launching)
+        if not self.workers:
+            raise RuntimeError("All workers failed to start!")
+
+        if self.elastic:
+            self.scale_thread = Thread(target=self._scale, daemon=True)
+            self.scale_thread.start()
+        if self.restart:
+            self.supervise_thread = Thread(target=self._supervise, daemon=True)
+            self.supervise_thread.start()
+
         # Return control to main thread immediately.
         # Other workers will join the pool whenever they finish booting.
 
+    def _spawn_all(self, tasks: List[Task]):
+        "Launcher thread body. The tasks are already counted as launching."
+        for task in tasks:
+            self._spawn(task, counted = True)
+
+    def _spawn(self, task: Task, counted: bool = False):
+        "Bring a task online in a startup thread"
+        if not counted:
+            with self.online:
+                self.launching += 1
+        t = Thread(target=self._launch, args=(task, *self.node_config), daemon=True)
+        t.start()
+        self.startup_threads.append(t)
+
+    @property
+    def elastic(self) -> bool:
+        return self.max_count > self.min_count
+
+    @property
+    def size(self) -> int:
+        "Tasks online or starting, excluding retired ones"
+        return self.launching + len(self.workers) - self.retiring
+
+    def _scale(self):
+        """
+        Autoscaler thread body. Samples the common queue every
+        scale_interval and resizes the pool by one task at a time.
+        """
+        common = self.context.common
+        saturated_since = idle_since = None
+        while not self.scale_stop.wait(self.scale_interval):
+            now = time.monotonic()
+            backlog = common.qsize()
+            if self.budget is not None:
+                saturated = self.budget.used >= self.budget.limit // 2
+            else:
+                saturated = backlog >= max(common.maxsize // 2, 1)
+            saturated_since = (saturated_since or now) if saturated else None
+            idle_since = (idle_since or now) if backlog == 0 else None
+
+            if (saturated_since is not None
+                    and now - saturated_since >= self.scale_up_after
+                    and self.size < self.max_count
+                    and not self.launching):
+                self._grow(backlog)
+                saturated_since = None
+            elif (idle_since is not None
+                    and now - idle_since >= self.scale_down_after
+                    and self.size > self.min_count):
+                self._retire(backlog)
+                idle_since = None
+
+            # Reap retired tasks as they exit
+            for worker in list(self.workers):
+                if worker.finished and worker.task.process:
+                    worker.task.process.poll()
+
+    def _grow(self, backlog: int):
+        "Add a task with the next bind_id"
+        task = self._task(len(self.tasks))
+        task.create_channels()
+        with self.readers_lock:
+            self.open_readers += len(self.reader_specs)
+        self.tasks.append(task)
+        self._spawn(task)
+        self.scaling_events.append(ScalingEvent(time.time(), "up", self.size, backlog))
+
+    def _retire(self, backlog: int):
+        """
+        Queue an EOF for whichever worker takes it next. That worker drains
+        its writers, closes its channels and stops taking, and its task
+        exits once it has processed its input.
+        """
+        self.retiring += 1
+        self.context.common.put(EOF)
+        if self.io_engine is not None:
+            self.io_engine.wake()
+        self.scaling_events.append(ScalingEvent(time.time(), "down", self.size, backlog))
+
+    def _supervise(self):
+        "Supervisor thread body. Polls for tasks that died and recovers them."
+        exhaust_channels = self.exhaust_channels
+        while not self.supervise_stop.wait(self.supervise_interval):
+            for worker in list(self.workers):
+                if worker.finished:
+                    continue
+                exited = worker.task.process.poll() is not None
+                broken = any(
+                    writer.broken for name, writer in worker.writers.items()
+                    if name in exhaust_channels
+                )
+                if exited or broken:
+                    self._recover(worker)
+
+    def _recover(self, worker: Worker):
+        task = worker.task
+        id = task.bind.get(self.bind_id)
+
+        # 1. Stop the worker, collect its undelivered batches and reap it.
+        # Its replacement gets retained broadcasts anew.
+        batches, dropped = worker.abandon(self.delivery)
+        batches = [batch for batch in batches if not isinstance(batch, Broadcast)]
+        if task.process.poll() is None:
+            task.process.kill()
+        task.process.wait()
+        if self.io_engine is not None:
+            self.io_engine.remove(worker)
+        self.workers.remove(worker)
+
+        # 2. Respawn with the same bind, unless it is restarting too often
+        history = self.restarts.setdefault(id, deque())
+        now = time.monotonic()
+        while history and now - history[0] > self.restart_window:
+            history.popleft()
+        restarted = len(history) < self.max_restarts
+        if restarted:
+            history.append(now)
+            self._respawn(task)
+
+        # 3. Replay to the healthy workers ahead of newer batches, or drop
+        # if there are none
+        if self.size > 0:
+            if self.budget is not None:
+                self.budget.charge(sum(self.sizer(untraced(batch)) for batch in batches))
+            requeue(self.context.common, batches)
+            if self.io_engine is not None:
+                self.io_engine.wake()
+        else:
+            dropped += len(batches)
+            batches = []
+
+        self.failures.append(Failure(
+            time.time(), id, task.process.returncode,
+            worker.completed, len(batches), dropped, restarted
+        ))
+
+    def _respawn(self, task: Task):
+        "Replace a dead task with a fresh one whose output files append"
+        fresh = self._task(task.bind[self.bind_id])
+        for channel in fresh.channels.values():
+            if isinstance(channel, FileChannel):
+                channel.append = True
+        fresh.create_channels()
+        with self.readers_lock:
+            self.open_readers += len(self.reader_specs)
+        # By identity: Tasks compare by value, which fails on unstarted ones
+        index = next(i for i, other in enumerate(self.tasks) if other is task)
+        self.tasks[index] = fresh
+        self._spawn(fresh)
+
     def feed(self, item):
-        self.context.common.put(item)
+        if self.metrics:
+            start = perf_counter()
+        trace = self.tracer.sample() if self.tracer is not None else None
+        size = self.sizer(item) if self.dispatcher or self.budget else 0
+        if self.budget is not None:
+            self.budget.acquire(size)
+        if self.reorder is not None:
+            item = Sequenced(self.reorder.admit(record_count(item)), item)
+        if trace is not None:
+            item = Traced(trace, item)
+        if self.dispatcher is not None:
+            self.dispatcher.put(item, size)
+        else:
+            self.context.common.put(item)
+        if trace is not None:
+            trace.queued = perf_counter()
+        if self.io_engine is not None:
+            self.io_engine.wake()
+        self.fed += 1
+        if self.metrics:
+            self.feed_time += perf_counter() - start
+
+    def broadcast(self, item, channels: Iterable[str] | None = None, retain: bool = False):
+        """
+        Deliver item to every live worker on channels (default: all
+        writer channels), behind everything fed before it and ahead of
+        everything fed after. Each channel encodes item once, with a bare
+        Writer as in the filter pool, and all workers share the output.
+        With retain, tasks that come online later (autoscaled or restarted)
+        get it before any data.
+        """
+        # 1. Encode once per channel
+        channels = list(self.writer_specs) if channels is None else list(channels)
+        for name in channels:
+            if name not in self.writer_specs:
+                raise ValueError(f"{name} is not a writer channel")
+        broadcast = Broadcast({
+            name: Encoded(encode(self.writer_specs[name].type, item))
+            for name in channels
+        })
+
+        self._broadcast(broadcast, retain)
+
+    def _broadcast(
+            self,
+            broadcast: Broadcast,
+            retain: bool = False,
+            session: bool = False
+        ) -> List[Worker]:
+        "Queue broadcast to every worker in stream order. Returns the workers online."
+        # 1. Routed: queue it in every inbox behind the data
+        if self.dispatcher is not None:
+            with self.broadcast_lock:
+                self.sessions += session
+                self.dispatcher.broadcast(broadcast, list(self.inboxes.values()))
+                return list(self.workers)
+
+        # 2. Shared: wait until workers have taken every earlier batch,
+        # then queue it to each one's writers
+        self.context.common.join()
+        with self.broadcast_lock:
+            self.sessions += session
+            if retain:
+                self.retained.append(broadcast)
+            workers = [worker for worker in self.workers if not worker.finished]
+            for worker in workers:
+                worker.dispatch(broadcast)
+        if self.io_engine is not None:
+            self.io_engine.wake(force = True)
+        return workers
+
+    def end_session(
+            self,
+            channels: Iterable[str] | None = None,
+            timeout: float | None = None
+        ) -> bool:
+        """
+        End a job on warm tasks. Every task gets session_marker on channels
+        (default: those that must be exhausted), behind the job's data. The
+        child should finish the job and echo the marker as one record on
+        each reader channel. Returns once all have, so every result of the
+        job has been delivered and results() ends. Without readers, returns
+        once the marker is written to every pipe. False on timeout.
+        """
+        if self.session_marker is None:
+            raise RuntimeError("end_session() requires a session_marker")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        channels = self.exhaust_channels if channels is None else list(channels)
+        marker = self.session_marker
+        broadcast = Broadcast({
+            name: Encoded(marker if "b" in self.writer_specs[name].mode.parent else marker.decode())
+            for name in channels
+        })
+
+        # 1. Let every task finish starting, so each gets the marker
+        with self.online:
+            self.online.wait_for(lambda: not self.launching)
+        workers = self._broadcast(broadcast, session = True)
+        session = self.sessions
+
+        # 2. Wait for each live reader to echo it, or the writers to drain
+        if self.reader_specs:
+            def echoed():
+                return all(
+                    reader.sessions >= session or reader.finished
+                    for worker in workers for reader in worker.readers.values()
+                )
+            with self.session_echo:
+                if not self.session_echo.wait_for(echoed, timeout):
+                    return False
+            if self.on_result is None:
+                self.results_queue.put(SESSION)
+            return True
+
+        for worker in workers:
+            for name in channels:
+                writer = worker.writers.get(name)
+                if writer is None:
+                    continue
+                with writer.queue.all_tasks_done:
+                    while writer.queue.unfinished_tasks and not writer.broken:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            return False
+                        # Bounded, as a broken pipe does not notify
+                        writer.queue.all_tasks_done.wait(min(remaining or 0.1, 0.1))
+        return True
+
+    def _echoed(self, reader: Reader):
+        "Reader.on_marker hook: count a session marker echoed by a child"
+        with self.session_echo:
+            reader.sessions += 1
+            self.session_echo.notify_all()
+
+    def stats(self) -> Stats:
+        """
+        Snapshot of feed blocking, queue depths, per-channel throughput and
+        process liveness. Counters stay zero when metrics is False.
+        """
+        return Stats(
+            time = time.time(),
+            fed = self.fed,
+            feed_time = self.feed_time,
+            common_depth = self.context.common.qsize(),
+            size = self.size,
+            memory_used = self.budget.used if self.budget else 0,
+            memory_peak = self.budget.peak if self.budget else 0,
+            workers = [worker.stats() for worker in list(self.workers)]
+        )
+
+    def _report(self):
+        while not self.stats_stop.wait(self.stats_interval):
+            self.on_stats(self.stats())
+
+    def feed_many(self, items: Iterable, chunk_size: int = 1024):
+        """
+        Feed records in chunks of up to chunk_size, so each chunk costs a
+        single round-trip through the common and writer queues. Queue
+        limits then count chunks rather than records.
+        """
+        partitioned = isinstance(self.dispatcher, Partitioned)
+        for chunk in Chunk.split(items, chunk_size):
+            if partitioned and self.reorder is not None:
+                # Sequence numbers must stay contiguous within a chunk
+                for record in chunk:
+                    self.feed(record)
+            elif partitioned:
+                for part in self.dispatcher.split(chunk):
+                    self.feed(part)
+            else:
+                self.feed(chunk)
+
+    def feed_from(
+            self,
+            source: str | os.PathLike | int | IO,
+            delimiter: bytes | int = b"\n",
+            chunk_bytes: int = 1 << 20
+        ) -> int:
+        """
+        Feed every record from a path, fd or binary file object (e.g.
+        sys.stdin) as Blocks of whole records, about chunk_bytes each,
+        without creating an object per record. Records end with delimiter,
+        or an int delimiter gives the size of a big-endian length prefix.
+        Regular files are memory-mapped. File objects are read through
+        their fd, so data already in their buffer is skipped. Returns the
+        number of records fed.
+        """
+        # 1. Resolve the fd, reading the preserved stdin once daemonized
+        match source:
+            case int(): fd, opened = source, False
+            case str() | os.PathLike(): fd, opened = os.open(source, os.O_RDONLY), True
+            case _: fd, opened = source.fileno(), False
+        if fd == 0 and self.stdin is not None:
+            fd = self.stdin.fileno()
+
+        # 2. Split and dispatch whole blocks. Key routing needs records.
+        partitioned = isinstance(self.dispatcher, Partitioned)
+        records = 0
+        try:
+            for block in Splitter(delimiter, chunk_bytes).read(fd):
+                records += block.num_records
+                if partitioned:
+                    self.feed_many(block.records(), chunk_size = block.num_records)
+                else:
+                    self.feed(block)
+        finally:
+            if opened:
+                os.close(fd)
+        return records
 
     def close(self):
-        self.context.eof.set()
+        if self.scale_thread is not None:
+            self.scale_stop.set()
+            self.scale_thread.join()
+        if self.supervise_thread is not None:
+            self.supervise_stop.set()
+            self.supervise_thread.join()
+
+        # 1. One EOF per task not already retiring, queued behind the data
+        # in the queue its worker takes from. Tasks that never come online
+        # leave theirs.
+        if self.inboxes:
+            for inbox in self.inboxes.values():
+                inbox.put(EOF)
+        else:
+            for _ in range(len(self.tasks) - self.retiring):
+                self.context.common.put(EOF)
+        if self.io_engine is not None:
+            self.io_engine.wake(force = True)
+
+        # 2. Stragglers still booting come online and take their EOF
+        if self.launcher is not None:
+            self.launcher.join()
+        for t in self.startup_threads:
+            t.join()
 
+        # 3. Wait for the channels that must be exhausted to write it
         exhaust_channels = self.exhaust_channels
-        
-        while True:
-            # COPY the list to avoid "RuntimeError: list changed size during iteration"
-            # if a straggler worker starts up right now.
-            current_workers = list(self.workers)
-            
-            if not current_workers:
-                # Should not happen if start() worked, but safety first
-                time.sleep(0.01)
-                continue
-
-            if all(w.exhausted(*exhaust_channels) for w in current_workers):
-                break
-            time.sleep(0.01)
+        if self.io_engine is not None:
+            self.io_engine.stop()
+        else:
+            for worker in self.workers:
+                worker.join(exhaust_channels)
 
         for task in self.tasks:
             if task.process:
                 task.process.wait()
 
+        for worker in list(self.workers):
+            for reader in worker.readers.values():
+                reader.thread.join()
+
+        if self.pool is not None and self.pool is not self.filter_pool:
+            self.pool.shutdown()
+
+        if self.stats_thread is not None:
+            self.stats_stop.set()
+            self.stats_thread.join()
+            self.on_stats(self.stats())
+
+        error = self._reader_error()
+        if error is not None:
+            raise error
+
+        # Supervision ends at close(). Crashes after that lose input.
+        if self.restart and any(
+            worker.writers[name].broken
+            for worker in self.workers for name in exhaust_channels
+            if name in worker.writers
+        ):
+            raise BrokenPipeError("a task exited during close() before receiving all its input")
+
+    def results(self) -> Iterator[Result]:
+        """
+        Yield Results as the readers parse them, ending once every reader
+        has reached EOF, or at the end of a session (see end_session).
+        Readers reach EOF when their subprocess exits, which happens after
+        close(), so either iterate after close() or feed from another
+        thread. Re-raises the first error a reader hit, once all are done.
+        """
+        while True:
+            result = self.results_queue.get()
+            if result is SESSION:
+                return
+            if result is None:
+                # Leave the marker for any other consumer
+                self.results_queue.put(None)
+                error = self._reader_error()
+                if error is not None:
+                    raise error
+                return
+            yield result
+
+    def _reader_error(self) -> BaseException | None:
+        "The first exception raised while reading or delivering results"
+        for worker in list(self.workers):
+            for reader in worker.readers.values():
+                if reader.error is not None:
+                    return reader.error
+        return None
+
+    def _sink(self, task: Task, channel: str, worker: Worker) -> Callable[[Any], None]:
+        id = task.bind.get(self.bind_id)
+        if self.reorder is not None:
+            def sink(value):
+                seq = worker.next_seq()
+                self.reorder.push(seq, Result(id, channel, value, seq))
+            return sink
+        deliver = self._deliver
+        return lambda value: deliver(Result(id, channel, value))
+
+    def _deliver(self, result: Result):
+        if self.on_result is not None:
+            self.on_result(result)
+        else:
+            self.results_queue.put(result)
+
+    def _reader_eof(self):
+        with self.readers_lock:
+            self.open_readers -= 1
+            if self.open_readers == 0:
+                self.results_queue.put(None)
+        # A dead task's readers stop end_session() waiting for its echo
+        with self.session_echo:
+            self.session_echo.notify_all()
+
     @property
     def exhaust_channels(self) -> List[str]:
         return [
@@ -155,22 +974,21 @@ class Coordinator:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
-    def _daemonize(self, source: IO, log_file: str = "/dev/null"):
+    def _daemonize(self, log_file: str = "/dev/null"):
         """
         Detach from the terminal using the Double Fork pattern.
         """
-        self.log.debug("Daemonizing")
         # 1. Flush buffers
         sys.stdout.flush()
         sys.stderr.flush()
 
         # 2. PRESERVE INPUT
-        # If source is stdin (FD 0), move it to a safe FD (e.g. 3) before nuking FD 0.
-        if hasattr(self.source, "fileno") and self.source.fileno() == 0:
-            saved_fd = os.dup(0)
-            # Re-wrap the safe FD into a new file object.
-            # buffering=0 is standard for pipe throughput; adjust if line-buffering is preferred.
-            source = os.fdopen(saved_fd, "rb", buffering=0)
+        # Move stdin (FD 0) to a safe FD before nuking FD 0. feed_from()
+        # reads it from there when given sys.stdin or fd 0.
+        saved_fd = os.dup(0)
+        # Re-wrap the safe FD into a new file object.
+        # buffering=0 is standard for pipe throughput; adjust if line-buffering is preferred.
+        self.stdin = os.fdopen(saved_fd, "rb", buffering=0)
 
         # 3. FORK #1 (Detach from Parent)
         try:
@@ -198,7 +1016,7 @@ class Coordinator:
         devnull = os.open(os.devnull, os.O_RDWR)
         log_fd = os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
 
-        # stdin -> /dev/null (We already saved the real input to self.source)
+        # stdin -> /dev/null (We already saved the real input to self.stdin)
         os.dup2(devnull, 0)
         # stdout -> log
         os.dup2(log_fd, 1)
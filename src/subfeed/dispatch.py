@@ -0,0 +1,276 @@
+from abc import ABC, abstractmethod
+from threading import Condition
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Any, Callable, Dict, Hashable, List
+import math
+import select
+import time
+import warnings
+from .chunk import Chunk, record_count, default_sizer
+from .reorder import Sequenced
+from .trace import untraced
+from .worker import Worker
+
+@dataclass
+class Dispatcher(ABC):
+    """
+    Routes each fed item to one online worker's inbox instead of letting
+    the workers race on the common queue. Each worker may hold up to a
+    depth of unwritten batches, adapted to its measured drain rate so
+    that roughly prefetch seconds of work is queued for it. Subclasses
+    choose among the workers that have room.
+    """
+    min_depth: int = 2
+    max_depth: int = 64
+    prefetch: float = 0.05
+
+    # Drain-rate smoothing: weight of the newest sample, and the shortest
+    # interval worth sampling.
+    alpha: float = 0.3
+    interval: float = 0.05
+
+    workers: List[Worker] = field(init = False)
+
+    def __post_init__(self):
+        self.workers = []
+        self.rates: Dict[int, List[float]] = {}
+        self.waiters = 0
+        self.cond = Condition()
+
+    def add(self, worker: Worker):
+        with self.cond:
+            self.workers.append(worker)
+            self.rates[id(worker)] = [time.monotonic(), 0, 0.]
+            # Account for broadcasts queued before the worker came online
+            for _ in range(worker.source.qsize()):
+                worker.assign(0)
+            self.cond.notify_all()
+
+    def put(self, item: Any, size: int):
+        "Block until some worker has room, then route item to it"
+        with self.cond:
+            self.waiters += 1
+            try:
+                while True:
+                    candidates = [w for w in self.workers if self._has_room(w)]
+                    if candidates:
+                        break
+                    self.cond.wait()
+            finally:
+                self.waiters -= 1
+            worker = self.choose(candidates)
+            worker.assign(size)
+        worker.source.put(item)
+
+    def broadcast(self, item: Any, inboxes: List[Queue]):
+        "Queue item in every task's inbox, behind the batches routed there"
+        with self.cond:
+            for worker in self.workers:
+                worker.assign(0)
+            for inbox in inboxes:
+                inbox.put(item)
+
+    def notify(self, count: int = 1):
+        "Writer.on_written hook: wake feeders waiting for room"
+        if self.waiters:
+            with self.cond:
+                self.cond.notify_all()
+
+    @abstractmethod
+    def choose(self, candidates: List[Worker]) -> Worker:
+        "The worker to route the next item to, among those with room"
+
+    def depth(self, worker: Worker) -> int:
+        "Batches this worker may hold, from its smoothed drain rate"
+        sample = self.rates[id(worker)]
+        now = time.monotonic()
+        elapsed = now - sample[0]
+        if elapsed >= self.interval:
+            completed = worker.drained
+            rate = (completed - sample[1]) / elapsed
+            sample[:] = [now, completed, self.alpha * rate + (1 - self.alpha) * sample[2]]
+        depth = math.ceil(sample[2] * self.prefetch)
+        return max(self.min_depth, min(self.max_depth, depth))
+
+    def _has_room(self, worker: Worker) -> bool:
+        worker.settle()
+        return worker.outstanding < self.depth(worker)
+
+@dataclass
+class RoundRobin(Dispatcher):
+    "Cycle through the workers, skipping any that are full"
+    def __post_init__(self):
+        super().__post_init__()
+        self.next = 0
+
+    def choose(self, candidates: List[Worker]) -> Worker:
+        count = len(self.workers)
+        for i in range(count):
+            worker = self.workers[(self.next + i) % count]
+            if worker in candidates:
+                self.next = (self.next + i + 1) % count
+                return worker
+
+@dataclass
+class LeastBytes(Dispatcher):
+    "Route to the worker with the fewest estimated bytes not yet written"
+    def choose(self, candidates: List[Worker]) -> Worker:
+        return min(candidates, key = lambda w: (w.inflight_bytes, w.outstanding))
+
+@dataclass
+class Writable(LeastBytes):
+    """
+    Prefer workers whose every writer pipe can accept data right now,
+    falling back to least outstanding bytes.
+    """
+    def choose(self, candidates: List[Worker]) -> Worker:
+        poll = select.poll()
+        worker_fds = []
+        for worker in candidates:
+            fds = []
+            for writer in worker.writers.values():
+                # A writer whose broken pipe was ignored drops its batches
+                if writer.broken:
+                    continue
+                try:
+                    fds.append(writer.io.fileno())
+                except ValueError:
+                    continue
+            for fd in fds:
+                poll.register(fd, select.POLLOUT)
+            worker_fds.append((worker, fds))
+        ready = {fd for fd, events in poll.poll(0) if events & select.POLLOUT}
+        writable = [
+            worker for worker, fds in worker_fds
+            if all(fd in ready for fd in fds)
+        ]
+        return super().choose(writable or candidates)
+
+POLICIES = {
+    "round_robin": RoundRobin,
+    "least_bytes": LeastBytes,
+    "writable": Writable
+}
+
+class SkewWarning(UserWarning):
+    pass
+
+@dataclass
+class Partitioned(Dispatcher):
+    """
+    Sticky key routing: every item whose key(item) hashes alike goes to
+    the same task, workers[hash(key) % count], so children can keep
+    per-key state. Keys use Python's hash(), which is only stable within
+    one coordinator process.
+
+    A partition is hot when it has received more than skew times its
+    fair share of at least min_samples items. hot_partitions() lists
+    them, and a SkewWarning is issued the first time each turns hot.
+    """
+    key: Callable[[Any], Hashable] | None = None
+    skew: float = 2.0
+    min_samples: int = 1024
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.key is None:
+            raise ValueError("Partitioned dispatch requires a key function")
+        self.inboxes: List[Queue] = []
+        self.owners: Dict[int, Worker] = {}
+        self.pending: List[int] = []
+        self.counts: List[int] = []
+        self.total = 0
+        self.warned = set()
+
+    def partition(self, inboxes: List[Queue]):
+        "Set the per-task inboxes, in task order"
+        self.inboxes = inboxes
+        self.pending = [0] * len(inboxes)
+        self.counts = [0] * len(inboxes)
+
+    def index(self, item: Any) -> int:
+        if isinstance(item, Chunk):
+            item = item[0]
+        return hash(self.key(item)) % len(self.inboxes)
+
+    def split(self, chunk: Chunk) -> List[Chunk]:
+        "Regroup a chunk into one chunk per partition"
+        parts: Dict[int, Chunk] = {}
+        for record in chunk:
+            parts.setdefault(self.index(record), Chunk()).append(record)
+        return list(parts.values())
+
+    def add(self, worker: Worker):
+        with self.cond:
+            index = self.inboxes.index(worker.source)
+            self.owners[index] = worker
+            self.rates[id(worker)] = [time.monotonic(), 0, 0.]
+            self.workers.append(worker)
+            # Account for items queued before the worker came online
+            for _ in range(self.pending[index]):
+                worker.assign(0)
+            self.pending[index] = 0
+            self.cond.notify_all()
+
+    def choose(self, candidates: List[Worker]) -> Worker:
+        "Unused by put(), which routes by key; the least loaded candidate"
+        return min(candidates, key = lambda w: (w.inflight_bytes, w.outstanding))
+
+    def put(self, item: Any, size: int):
+        "Block until the item's partition has room, then route it there"
+        # Route on the fed item, inside any tracing and ordering wrappers
+        record = untraced(item)
+        if isinstance(record, Sequenced):
+            record = record.item
+        index = self.index(record)
+        with self.cond:
+            self.waiters += 1
+            try:
+                while not self._slot_has_room(index):
+                    self.cond.wait()
+            finally:
+                self.waiters -= 1
+            worker = self.owners.get(index)
+            if worker is not None:
+                worker.assign(size)
+            else:
+                self.pending[index] += 1
+            self._count(index, record_count(record))
+        self.inboxes[index].put(item)
+
+    def broadcast(self, item: Any, inboxes: List[Queue]):
+        "Queue item in every partition's inbox, behind the batches routed there"
+        with self.cond:
+            for index, inbox in enumerate(self.inboxes):
+                worker = self.owners.get(index)
+                if worker is not None:
+                    worker.assign(0)
+                else:
+                    self.pending[index] += 1
+                inbox.put(item)
+
+    def _slot_has_room(self, index: int) -> bool:
+        worker = self.owners.get(index)
+        if worker is None:
+            return self.pending[index] < self.max_depth
+        return self._has_room(worker)
+
+    def _count(self, index: int, records: int):
+        self.counts[index] += records
+        self.total += records
+        if self.total < self.min_samples or index in self.warned:
+            return
+        if index in self.hot_partitions():
+            self.warned.add(index)
+            warnings.warn(
+                f"partition {index} received {self.counts[index]} of "
+                f"{self.total} records", SkewWarning
+            )
+
+    def hot_partitions(self) -> List[int]:
+        "Partitions holding more than skew times their fair share"
+        if self.total < self.min_samples:
+            return []
+        limit = self.skew * self.total / len(self.counts)
+        return [i for i, count in enumerate(self.counts) if count > limit]
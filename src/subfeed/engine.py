@@ -0,0 +1,294 @@
+from threading import Thread
+from queue import Queue, Empty
+from dataclasses import dataclass, field
+from typing import Any, List, Dict
+import selectors
+import os
+from .sync_context import SyncContext, EOF, requeue
+from .worker import Worker
+from .writer import Writer
+from .rawio import FileRegion
+from .channel import BROKEN_PIPE
+
+@dataclass
+class Slot:
+    "Output pending on one Writer's fd"
+    writer: Writer
+    fd: int
+    view: memoryview | None = None
+    batches: int = 0
+    outputs: List[Any] = field(default_factory = list)
+    watched: bool = False
+
+    # The writer's EOF has been taken; drop once the view is written
+    eof: bool = False
+
+@dataclass
+class SelectorEngine:
+    """
+    Drives the writers of every Worker from a single thread. Writer fds are
+    made non-blocking and written only when the pipe can accept data, so a
+    child that is not reading one channel never stalls the others.
+    """
+    context: SyncContext
+    timeout = 1.
+    thread: Thread = field(init = False)
+
+    def __post_init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.arrivals: Queue = Queue()
+        self.departures: Queue = Queue()
+        self.workers: List[Worker] = []
+        self.slots: Dict[int, Slot] = {}
+        self.errors: List[BaseException] = []
+        self.discarding: List[Writer] = []
+        self.waiting = False
+        self.stopping = False
+        self.next = 0
+
+        # Self-pipe so feed(), add() and stop() can interrupt select()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ)
+
+        self.thread = Thread(target = self.run, daemon = True)
+
+    def start(self):
+        self.thread.start()
+
+    def add(self, worker: Worker):
+        "Hand a started Task's Worker to the loop. Thread-safe."
+        self.arrivals.put(worker)
+        self.wake(force = True)
+
+    def remove(self, worker: Worker):
+        "Drop a dead Worker's writers without writing the rest. Thread-safe."
+        self.departures.put(worker)
+        self.wake(force = True)
+
+    def wake(self, force: bool = False):
+        "Interrupt select() if the loop is sleeping"
+        if self.waiting or force:
+            try:
+                os.write(self.wake_w, b"\0")
+            except BlockingIOError:
+                pass
+
+    def stop(self):
+        """
+        Wait until every writer that must be exhausted has written its
+        EOF, then close the rest and end the loop. Call after queueing
+        EOFs. Re-raises the first unignored write error.
+        """
+        self.stopping = True
+        self.wake(force = True)
+        self.thread.join()
+        self.selector.close()
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+        if self.errors:
+            raise self.errors[0]
+
+    def run(self):
+        while True:
+            self._admit()
+            if self.stopping and self._drained():
+                break
+            self._distribute()
+            self._discard()
+            for slot in list(self.slots.values()):
+                self._pump(slot)
+
+            # Publish that we are about to sleep, then re-check for work
+            # so a concurrent feed() cannot be missed.
+            self.waiting = True
+            if not self._idle():
+                self.waiting = False
+                continue
+            for key, _ in self.selector.select(timeout = self.timeout):
+                if key.fd == self.wake_r:
+                    self._drain_wakeups()
+            self.waiting = False
+
+        for slot in list(self.slots.values()):
+            self._pump(slot)
+            self._drop(slot)
+
+    def _idle(self) -> bool:
+        if not self.arrivals.empty() or not self.departures.empty():
+            return False
+        if (self.stopping and self._drained()):
+            return False
+        return not any(
+            worker.source.qsize() and worker.ready() and not worker.finished
+            for worker in self.workers
+        )
+
+    def _drained(self) -> bool:
+        "True once only writers that need not be exhausted remain"
+        return not any(slot.writer.exhaust for slot in self.slots.values())
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _admit(self):
+        while True:
+            try:
+                worker = self.arrivals.get_nowait()
+            except Empty:
+                return
+            self.workers.append(worker)
+            for writer in worker.writers.values():
+                writer.io.flush()
+                fd = writer.io.fileno()
+                os.set_blocking(fd, False)
+                self.slots[fd] = Slot(writer = writer, fd = fd)
+
+        while True:
+            try:
+                worker = self.departures.get_nowait()
+            except Empty:
+                break
+            if worker in self.workers:
+                self.workers.remove(worker)
+            writers = [id(writer) for writer in worker.writers.values()]
+            for slot in list(self.slots.values()):
+                if id(slot.writer) in writers:
+                    self._drop(slot)
+
+    def _distribute(self):
+        "Move batches from each worker's source to workers with free capacity"
+        count = len(self.workers)
+        for i in range(count):
+            worker = self.workers[(self.next + i) % count]
+            while worker.ready() and not worker.finished:
+                try:
+                    batch = worker.source.get_nowait()
+                except Empty:
+                    break
+                if not worker.dispatch(batch):
+                    requeue(worker.source, [batch])
+                worker.source.task_done()
+        self.next += 1
+
+    def _discard(self):
+        "Drop batches queued to writers whose broken pipe was ignored, up to EOF"
+        for writer in list(self.discarding):
+            while not writer.finished:
+                try:
+                    batch = writer.queue.get_nowait()
+                except Empty:
+                    break
+                if not writer.at_eof(batch):
+                    writer.queue.task_done()
+                    writer.drop(1)
+            if writer.finished:
+                self.discarding.remove(writer)
+
+    def _pump(self, slot: Slot):
+        "Write until the pipe is full or the writer's queue is empty"
+        writer = slot.writer
+        while slot.view is not None or self._load(slot):
+            try:
+                written = os.write(slot.fd, slot.view)
+            except BlockingIOError:
+                self._watch(slot, True)
+                return
+            except BROKEN_PIPE as e:
+                self._drop(slot, e)
+                return
+            if writer.stats is not None:
+                writer.stats.bytes += written
+            slot.view = slot.view[written:]
+            if not slot.view:
+                self._complete(slot)
+        self._watch(slot, False)
+        if slot.eof:
+            self._drop(slot)
+
+    def _load(self, slot: Slot) -> bool:
+        "Encode every batch waiting in the writer's queue into one buffer"
+        writer = slot.writer
+        outputs = []
+        while not slot.eof:
+            try:
+                batch = writer.queue.get_nowait()
+            except Empty:
+                break
+            if batch is EOF:
+                writer.queue.task_done()
+                slot.eof = True
+            else:
+                outputs.append(writer.process(batch))
+        if not outputs:
+            return False
+        if writer.budget is not None:
+            slot.outputs = outputs
+        if None in outputs:
+            # Channels a broadcast skipped: complete them without writing
+            empty = "" if any(isinstance(o, str) for o in outputs) else b""
+            outputs = [empty if o is None else o for o in outputs]
+        if any(isinstance(output, FileRegion) for output in outputs):
+            self._drop(slot, TypeError("FileRegion outputs require the threads engine"))
+            return False
+        output = writer.join(outputs)
+        if isinstance(output, str):
+            output = output.encode(getattr(writer.io, "encoding", None) or "utf-8")
+        slot.view = memoryview(output).cast("B")
+        slot.batches = len(outputs)
+        if not slot.view:
+            # Nothing to write: complete now and load what follows
+            self._complete(slot)
+            return self._load(slot)
+        return True
+
+    def _complete(self, slot: Slot):
+        slot.view = None
+        self._release(slot)
+        for _ in range(slot.batches):
+            slot.writer.queue.task_done()
+        slot.writer.complete(slot.batches)
+        slot.batches = 0
+
+    def _watch(self, slot: Slot, watch: bool):
+        if watch and not slot.watched:
+            self.selector.register(slot.fd, selectors.EVENT_WRITE)
+        elif slot.watched and not watch:
+            self.selector.unregister(slot.fd)
+        slot.watched = watch
+
+    def _release(self, slot: Slot):
+        if slot.outputs:
+            slot.writer.release(slot.outputs)
+            slot.outputs = []
+
+    def _drop(self, slot: Slot, error: BaseException = None):
+        self._watch(slot, False)
+        self.slots.pop(slot.fd, None)
+        self._release(slot)
+        writer = slot.writer
+        if error is not None:
+            writer.broken = True
+            if writer.on_encoded is not None:
+                writer.on_encoded()
+            if not writer.ignore_broken_pipe:
+                self.errors.append(error)
+            else:
+                for _ in range(slot.batches):
+                    writer.queue.task_done()
+                writer.drop(slot.batches)
+                slot.batches = 0
+                if not slot.eof:
+                    # Keep draining so the Worker never blocks on this channel
+                    self.discarding.append(writer)
+        # Close input to unblock processes that are waiting on EOF for it
+        try:
+            writer.io.close()
+        except BROKEN_PIPE as e:
+            if not writer.ignore_broken_pipe:
+                self.errors.append(e)
@@ -0,0 +1,114 @@
+"""
+CPU placement and priorities for tasks and Coordinator threads (Linux).
+
+A task's CPU set, nice value and I/O priority are applied in the child
+between fork and exec, so it never runs unpinned. Pinning a task to the
+CPUs of one NUMA node also keeps the memory it touches on that node.
+"""
+import ctypes
+import errno
+import glob
+import os
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Set
+
+# I/O scheduling classes for ioprio: (class, level), level 0 (highest) to 7
+IOPRIO_CLASS_RT = 1
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+
+# ioprio_set has no wrapper in Python or glibc
+IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314,
+              "ppc64le": 273, "s390x": 282, "riscv64": 30}
+IOPRIO_WHO_PROCESS = 1
+
+def parse_cpus(cpus: str | int | Iterable[int]) -> Set[int]:
+    "CPU set from a cpulist like '0-3,8,10-11', a CPU number or CPU numbers"
+    match cpus:
+        case int(): return {cpus}
+        case str():
+            result = set()
+            for part in filter(None, cpus.replace(" ", "").split(",")):
+                first, _, last = part.partition("-")
+                result.update(range(int(first), int(last or first) + 1))
+            return result
+        case _: return set(cpus)
+
+def available_cpus() -> Set[int]:
+    "CPUs this process may run on"
+    return os.sched_getaffinity(0)
+
+def numa_nodes() -> List[Set[int]]:
+    "Available CPUs of each NUMA node, or all of them as one node if unknown"
+    available = available_cpus()
+    nodes = []
+    paths = glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")
+    for path in sorted(paths, key = lambda path: int(re.search(r"node(\d+)", path)[1])):
+        with open(path) as f:
+            cpus = parse_cpus(f.read().strip()) & available
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [available]
+
+def plan(pin: str | None, reserved: Set[int]) -> List[Set[int]] | None:
+    """
+    CPU sets for tasks to take in turn, from the available CPUs outside
+    reserved: one per CPU under "cpu", one per NUMA node under "numa", or
+    all of them in one set if only reserved is given. None to leave tasks
+    unpinned.
+    """
+    free = available_cpus() - reserved
+    if (pin or reserved) and not free:
+        raise ValueError("no CPUs left for tasks outside coordinator_cpus")
+    match pin:
+        case None: return [free] if reserved else None
+        case "cpu": return [{cpu} for cpu in sorted(free)]
+        case "numa": return [node - reserved for node in numa_nodes() if node - reserved]
+    raise ValueError(f"Unknown pin policy {pin!r}")
+
+@lru_cache(maxsize = None)
+def libc() -> ctypes.CDLL:
+    return ctypes.CDLL(None, use_errno = True)
+
+def set_ioprio(ioclass: int, level: int = 0, pid: int = 0):
+    "Set the I/O scheduling class and level of a process, 0 for this one"
+    number = IOPRIO_SET.get(os.uname().machine)
+    if number is None:
+        raise OSError(errno.ENOSYS, "ioprio_set is not known on this platform")
+    if libc().syscall(number, IOPRIO_WHO_PROCESS, pid, ioclass << 13 | level) < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+def preexec(cpus: Set[int] | None, nice: int | None, ioprio: tuple | None) -> Callable | None:
+    "Function applying the given settings in a child before exec, or None"
+    if cpus is None and nice is None and ioprio is None:
+        return None
+    # Loaded before fork, as the child must not take the loader's lock
+    if ioprio is not None:
+        libc()
+    def apply():
+        if cpus is not None:
+            os.sched_setaffinity(0, cpus)
+        if nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, nice)
+        if ioprio is not None:
+            set_ioprio(*ioprio)
+    return apply
+
+@contextmanager
+def pinned(cpus: Set[int] | None) -> Iterator[None]:
+    """
+    Pin the calling thread to cpus for the duration, so threads it starts
+    meanwhile (and theirs) inherit the set. Then restore its own.
+    """
+    if not cpus:
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from collections import deque
+from itertools import islice
+from typing import Any, Iterable, List
+import errno
+import os
+
+IOV_MAX = os.sysconf("SC_IOV_MAX") if "SC_IOV_MAX" in os.sysconf_names else 1024
+
+@dataclass
+class FileRegion:
+    """
+    count bytes of an open file starting at offset. Written to a channel
+    with os.splice/os.sendfile, so the data never passes through Python.
+    """
+    fd: int
+    offset: int
+    count: int
+
+    def __len__(self) -> int:
+        return self.count
+
+def write_all(fd: int, outputs: Iterable[Any]):
+    """
+    Write bytes-like outputs and FileRegions to fd in order, resuming
+    after partial writes.
+    """
+    buffers = []
+    for output in outputs:
+        if isinstance(output, FileRegion):
+            writev_all(fd, buffers)
+            buffers = []
+            copy_region(output, fd)
+        elif len(output):
+            buffers.append(output)
+    writev_all(fd, buffers)
+
+def writev_all(fd: int, buffers: List[Any]):
+    "os.writev the buffers without copying them, resuming after partial writes"
+    views = deque(memoryview(buffer).cast("B") for buffer in buffers)
+    while views:
+        written = os.writev(fd, list(islice(views, IOV_MAX)))
+        while written:
+            view = views[0]
+            if written >= len(view):
+                written -= len(view)
+                views.popleft()
+            else:
+                views[0] = view[written:]
+                written = 0
+
+def copy_region(region: FileRegion, fd: int):
+    "Move a FileRegion into fd in-kernel: splice into pipes, else sendfile"
+    offset = region.offset
+    remaining = region.count
+    copy = _splice if hasattr(os, "splice") else _sendfile
+    while remaining:
+        try:
+            copied = copy(region.fd, fd, offset, remaining)
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS) or copy is _pread:
+                raise
+            # splice needs a pipe on one side; sendfile may be unsupported
+            copy = _sendfile if copy is _splice else _pread
+            continue
+        if copied == 0:
+            raise EOFError(f"{region} extends past the end of its file")
+        offset += copied
+        remaining -= copied
+
+def _splice(src: int, dst: int, offset: int, count: int) -> int:
+    return os.splice(src, dst, count, offset_src = offset)
+
+def _sendfile(src: int, dst: int, offset: int, count: int) -> int:
+    return os.sendfile(dst, src, offset, count)
+
+def _pread(src: int, dst: int, offset: int, count: int) -> int:
+    data = os.pread(src, min(count, 1 << 20), offset)
+    writev_all(dst, [data])
+    return len(data)
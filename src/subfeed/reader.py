@@ -0,0 +1,91 @@
+from threading import Thread
+from dataclasses import dataclass, field
+from typing import IO, Callable, List, Any, Tuple
+
+@dataclass
+class Result:
+    id: Any        # The task's bind_id value, e.g. 0 for "{id}" = 0
+    channel: str
+    value: Any
+    seq: int | None = None   # Input position, in ordered mode
+
+@dataclass
+class Reader:
+    """
+    Counterpart to Writer: reads a subprocess output channel, splits it
+    into records and hands each parsed record to sink as it arrives.
+    """
+    io: IO
+    sink: Callable[[Any], None]
+    delimiter: bytes = b"\n"
+    bufsize: int = 1 << 16
+    on_eof: Callable[[], Any] | None = None
+
+    # Session marker echoed by the child (see Coordinator.end_session).
+    # Matching records are counted in sessions instead of parsed.
+    marker: bytes | None = None
+    on_marker: Callable[["Reader"], Any] | None = None
+    sessions: int = 0
+    thread: Thread = field(init = False)
+
+    def start(self):
+        self.thread.start()
+
+    def read(self):
+        try:
+            self.consume()
+        except BaseException as e:
+            # Kept for Coordinator.results() and close() to re-raise. Keep
+            # draining, so the child never blocks on a full pipe.
+            self.error = e
+            self.drain()
+        finally:
+            self.io.close()
+            self.finished = True
+            if self.on_eof is not None:
+                self.on_eof()
+
+    def consume(self):
+        "Read, split and deliver records until EOF"
+        read = getattr(self.io, "read1", self.io.read)
+        marker = self.marker
+        rest = b""
+        while True:
+            data = read(self.bufsize)
+            if not data:
+                break
+            records, rest = self.split(rest + data)
+            for record in records:
+                if record == marker:
+                    self.on_marker(self)
+                else:
+                    self.sink(self.parse(record))
+
+        # Unterminated final record
+        if rest == marker:
+            self.on_marker(self)
+        elif rest:
+            self.sink(self.parse(rest))
+
+    def drain(self):
+        "Read and drop the rest of the output"
+        read = getattr(self.io, "read1", self.io.read)
+        try:
+            while read(self.bufsize):
+                pass
+        except (OSError, ValueError):
+            pass
+
+    def split(self, data: bytes) -> Tuple[List[bytes], bytes]:
+        "Split data into complete records and an incomplete remainder"
+        *records, rest = data.split(self.delimiter)
+        return records, rest
+
+    def parse(self, record: bytes):
+        "Identity parser"
+        return record
+
+    def __post_init__(self):
+        self.finished = False
+        self.error: BaseException | None = None
+        self.thread = Thread(target = self.read, daemon = True)
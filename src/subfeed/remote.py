@@ -0,0 +1,199 @@
+"""
+Coordinator side of remote tasks, run by a subfeed agent on another host
+(see subfeed.agent).
+
+Each agent address has one pooled control connection, shared by every
+task placed there. Over it, the Coordinator asks the agent to spawn a
+task and the agent reports the task's pid and, later, its exit status.
+Each relayed channel of a task then gets its own stream connection,
+which the Writers and Readers use like a pipe. Backpressure carries
+through TCP flow control and the agent's blocking writes into the
+child's pipe.
+
+Control connections authenticate first: the agent sends a random
+challenge, which the Coordinator answers with its HMAC under the key
+both share in SUBFEED_AGENT_KEY. Channel connections are then named by
+a token the agent hands out over the authenticated control connection.
+"""
+import hashlib
+import hmac
+import json
+import os
+import signal
+from dataclasses import dataclass, field
+from subprocess import TimeoutExpired
+from threading import Thread, Lock, Event
+from typing import Any, ClassVar, Dict
+from .channel import Channel, SubprocessPipe, AnonChannel, FileChannel, SocketChannel, connect
+from .placement import parse_cpus
+
+# Returncode of a remote task whose agent connection was lost
+LOST = -signal.SIGHUP
+
+# Environment variable holding the key shared by agents and Coordinators
+KEY_ENV = "SUBFEED_AGENT_KEY"
+
+def agent_key() -> bytes | None:
+    key = os.environ.get(KEY_ENV)
+    return key.encode() if key else None
+
+def proof(key: bytes | None, challenge: str) -> str:
+    "Answer to an agent's challenge: its HMAC-SHA256 under key"
+    return hmac.new(key or b"", challenge.encode(), hashlib.sha256).hexdigest()
+
+def describe(channel: Channel | None) -> Any:
+    "How the agent should set up a channel: a relayed pipe, a file there, or nothing"
+    match channel:
+        case None: return None
+        case SubprocessPipe() | AnonChannel(): return "pipe"
+        case FileChannel(): return {"path": channel.path, "append": channel.append}
+        case _: raise ValueError(f"{type(channel).__name__} is not supported by remote tasks")
+
+@dataclass
+class RemoteProcess:
+    "Stand-in for the Popen of a task that an agent runs"
+    client: "AgentClient"
+    id: int
+    pid: int | None = None
+    returncode: int | None = None
+    exited: Event = field(default_factory = Event)
+
+    def poll(self) -> int | None:
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        if not self.exited.wait(timeout):
+            raise TimeoutExpired(f"remote task {self.pid}", timeout)
+        return self.returncode
+
+    def send_signal(self, sig: int):
+        if not self.exited.is_set():
+            self.client.send({"signal": self.id, "number": int(sig)})
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def exit(self, returncode: int):
+        self.returncode = returncode
+        self.exited.set()
+
+@dataclass
+class AgentClient:
+    "The pooled control connection to one agent"
+    address: str
+    pool: ClassVar[Dict[str, "AgentClient"]] = {}
+    pool_lock: ClassVar[Lock] = Lock()
+
+    def __post_init__(self):
+        self.sock = connect(self.address)
+        self.sock.sendall(b'{"control": true}\n')
+        self.lines = self.sock.makefile("rb")
+
+        # Prove we hold the key before the agent accepts any request
+        try:
+            challenge = json.loads(self.lines.readline())["challenge"]
+            self.sock.sendall(json.dumps({"proof": proof(agent_key(), challenge)}).encode() + b"\n")
+            authenticated = json.loads(self.lines.readline())["authenticated"]
+        except (ValueError, KeyError):
+            authenticated = False
+        if not authenticated:
+            self.sock.close()
+            raise PermissionError(f"agent {self.address} rejected the key in {KEY_ENV}")
+        self.lock = Lock()
+        self.next = 0
+        self.replies: Dict[int, list] = {}
+        self.processes: Dict[int, RemoteProcess] = {}
+        self.closed = False
+        self.thread = Thread(target = self.receive, daemon = True)
+        self.thread.start()
+
+    @staticmethod
+    def get(address: str) -> "AgentClient":
+        "The open connection to address, connecting on first use"
+        with AgentClient.pool_lock:
+            client = AgentClient.pool.get(address)
+            if client is None or client.closed:
+                client = AgentClient.pool[address] = AgentClient(address)
+            return client
+
+    def send(self, message: Dict):
+        with self.lock:
+            self.sock.sendall(json.dumps(message).encode() + b"\n")
+
+    def spawn(self, request: Dict) -> tuple[RemoteProcess, str]:
+        "Start a task on the agent. Returns its process and channel token."
+        with self.lock:
+            id = self.next
+            self.next += 1
+            reply = self.replies[id] = [Event(), None]
+        self.send({"spawn": id, **request})
+        reply[0].wait()
+        message = reply[1]
+        if message is None:
+            raise ConnectionError(f"lost connection to agent {self.address}")
+        if "error" in message:
+            raise OSError(f"agent {self.address}: {message['error']}")
+        return self.processes[id], message["token"]
+
+    def receive(self):
+        "Control thread body: route replies and exit statuses"
+        try:
+            for line in self.lines:
+                message = json.loads(line)
+                if "spawned" in message:
+                    # Registered here, as its exit may be the next message
+                    id = message["spawned"]
+                    if "pid" in message:
+                        self.processes[id] = RemoteProcess(self, id, message["pid"])
+                    reply = self.replies.pop(id)
+                    reply[1] = message
+                    reply[0].set()
+                elif "exited" in message:
+                    process = self.processes.pop(message["exited"], None)
+                    if process is not None:
+                        process.exit(message["returncode"])
+        except (OSError, ValueError):
+            pass
+        finally:
+            # The agent kills its tasks when the connection drops
+            self.closed = True
+            for reply in list(self.replies.values()):
+                reply[0].set()
+            for process in list(self.processes.values()):
+                process.exit(LOST)
+            self.sock.close()
+
+def start_remote(task, modes: Dict):
+    """
+    Start task on its agent and connect a SocketChannel in place of each
+    relayed channel. Called by Task.start for tasks with an agent.
+    """
+    client = AgentClient.get(task.agent)
+    std = {"stdin": task.stdin, "stdout": task.stdout, "stderr": task.stderr}
+    process, token = client.spawn({
+        "args": task.args,
+        "pipe_size": task.pipe_size,
+        "cpus": sorted(parse_cpus(task.cpus)) if task.cpus is not None else None,
+        "nice": task.nice,
+        "ioprio": task.ioprio,
+        **{name: describe(channel) for name, channel in std.items()},
+        "sidein": {name: describe(channel) for name, channel in task.sidein.items()},
+        "sideout": {name: describe(channel) for name, channel in task.sideout.items()}
+    })
+    task.process = process
+
+    # One connection per relayed channel, named by the token
+    def relay(name: str, channel: Channel) -> Channel:
+        if describe(channel) != "pipe":
+            return channel
+        hello = json.dumps({"token": token, "channel": name}).encode() + b"\n"
+        socket_channel = SocketChannel(task.agent, hello, pipe_size = task.pipe_size)
+        socket_channel.open(modes[name].parent)
+        return socket_channel
+
+    task.stdin, task.stdout, task.stderr = (relay(name, channel) for name, channel in std.items())
+    task.sidein = {name: relay(name, channel) for name, channel in task.sidein.items()}
+    task.sideout = {name: relay(name, channel) for name, channel in task.sideout.items()}
@@ -0,0 +1,50 @@
+from threading import Condition
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+@dataclass
+class Sequenced:
+    "A fed item tagged with the sequence number of its first record"
+    seq: int
+    item: Any
+
+class Reorder:
+    """
+    Bounded reorder buffer. admit() hands out sequence numbers to feed()
+    and blocks while more than limit records are outstanding; push()
+    accepts results in any order and delivers them in sequence order.
+    """
+
+    def __init__(self, deliver: Callable[[Any], Any], limit: int):
+        if limit < 1:
+            raise ValueError("reorder limit must be at least 1")
+        self.deliver = deliver
+        self.limit = limit
+        self.fed = 0
+        self.next = 0
+        self.buffer: Dict[int, Any] = {}
+        self.cond = Condition()
+
+    def admit(self, count: int = 1) -> int:
+        with self.cond:
+            # An oversized chunk is admitted alone rather than never
+            while self.fed > self.next and self.fed + count - self.next > self.limit:
+                self.cond.wait()
+            seq = self.fed
+            self.fed += count
+            return seq
+
+    def push(self, seq: int, value: Any):
+        with self.cond:
+            self.buffer[seq] = value
+            if seq != self.next:
+                return
+            # Deliver under the lock so concurrent readers cannot reorder
+            while self.next in self.buffer:
+                self.deliver(self.buffer.pop(self.next))
+                self.next += 1
+            self.cond.notify_all()
+
+    @property
+    def outstanding(self) -> int:
+        return self.fed - self.next
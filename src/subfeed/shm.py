@@ -0,0 +1,236 @@
+"""
+Shared-memory ring buffer behind ShmChannel.
+
+The parent's ShmWriter copies each record into a memory-mapped file in
+/dev/shm. The child's ShmReader hands it out as a memoryview into the
+same mapping, so a record crosses with one copy instead of two, and
+without a trip through the pipe buffer.
+
+Layout: a header page holding head (bytes published by the writer), tail
+(bytes released by the reader) and a closed flag, each on its own cache
+line, followed by the data region. Each record is an 8-byte length then
+the payload, padded to 8 bytes. A record never wraps: if it does not fit
+before the end of the region, a WRAP marker sends the reader back to the
+start.
+
+Two pipes carry wakeups: the writer rings a doorbell after publishing,
+and the reader writes a credit after releasing space. To keep syscalls
+off the hot path, each side only writes to its pipe when the other has
+set its waiting flag in the header. A side that finds the ring empty or
+full sets its flag, checks again and then waits on its pipe. Python
+cannot fence between the flag and the check, so that wait is bounded by
+WAIT seconds. When a pipe reads EOF, the other process has gone away.
+
+Child side:
+
+    from subfeed.shm import ShmReader
+    for record in ShmReader.from_env("tiles"):
+        process(record)   # memoryview, valid until the next record
+"""
+import mmap
+import os
+import select
+import struct
+from dataclasses import dataclass, field
+from typing import Iterator
+
+HEAD = 0
+TAIL = 64
+CLOSED = 128
+READER_WAITING = 192
+WRITER_WAITING = 256
+DATA = mmap.PAGESIZE
+WAIT = 0.01
+LENGTH = struct.Struct("<Q")
+WRAP = (1 << 64) - 1
+
+def padded(length: int) -> int:
+    "Bytes a record of this payload length occupies in the ring"
+    return LENGTH.size + (length + 7 & ~7)
+
+@dataclass
+class Ring:
+    fd: int
+    buffer: mmap.mmap = field(init = False)
+    capacity: int = field(init = False)
+
+    def __post_init__(self):
+        # Map every page up front rather than faulting them in one by one
+        flags = mmap.MAP_SHARED | getattr(mmap, "MAP_POPULATE", 0)
+        self.buffer = mmap.mmap(self.fd, os.fstat(self.fd).st_size, flags = flags)
+        self.capacity = (len(self.buffer) - DATA) & ~7
+        self.view = memoryview(self.buffer)
+
+    def load(self, offset: int) -> int:
+        return LENGTH.unpack_from(self.buffer, offset)[0]
+
+    def store(self, offset: int, value: int):
+        LENGTH.pack_into(self.buffer, offset, value)
+
+    def wait(self, flag: int, ready, fd: int) -> bool:
+        """
+        Set the waiting flag at offset flag and block on fd until ready()
+        or WAIT elapses. Returns False if the other end of fd has closed.
+        """
+        self.store(flag, 1)
+        try:
+            if ready():
+                return True
+            # poll rather than select, which fails for fds of 1024 and up
+            poll = select.poll()
+            poll.register(fd, select.POLLIN)
+            if poll.poll(WAIT * 1000):
+                return bool(os.read(fd, 4096))
+            return True
+        finally:
+            self.store(flag, 0)
+
+    @staticmethod
+    def notify(fd: int):
+        try:
+            os.write(fd, b"\0")
+        except (BlockingIOError, BrokenPipeError):
+            # A full pipe already holds a pending wakeup, and a broken
+            # one is reported to the other side's reads.
+            pass
+
+    @staticmethod
+    def create(size: int, dir: str = "/dev/shm") -> int:
+        "Create an unlinked shared-memory file for a ring of size bytes"
+        name = os.path.join(dir, f"subfeed-{os.getpid()}-{os.urandom(6).hex()}")
+        fd = os.open(name, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        os.unlink(name)
+        os.ftruncate(fd, DATA + (size + 7 & ~7))
+        return fd
+
+@dataclass
+class ShmWriter(Ring):
+    """
+    File-like producer end, used as a ShmChannel's io. Each write() is one
+    record. Blocks while the ring is full, and raises BrokenPipeError once
+    the reader has gone away.
+    """
+    doorbell: int = -1
+    credit: int = -1
+    closed: bool = field(init = False, default = False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        os.set_blocking(self.doorbell, False)
+        os.set_blocking(self.credit, False)
+        self.head = self.load(HEAD)
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        length = len(data)
+        need = padded(length)
+        if need > self.capacity:
+            raise ValueError(f"record of {length} bytes exceeds the ring capacity of {self.capacity}")
+
+        # 1. Skip to the start if the record would run past the end
+        offset = self.head % self.capacity
+        if offset + need > self.capacity:
+            self.reserve(self.capacity - offset)
+            self.store(DATA + offset, WRAP)
+            self.publish(self.capacity - offset)
+            offset = 0
+
+        # 2. Copy the record in, then publish it
+        self.reserve(need)
+        self.store(DATA + offset, length)
+        start = DATA + offset + LENGTH.size
+        self.view[start:start + length] = data
+        self.publish(need)
+        return length
+
+    def publish(self, size: int):
+        self.head += size
+        self.store(HEAD, self.head)
+        if self.load(READER_WAITING):
+            self.notify(self.doorbell)
+
+    def reserve(self, need: int):
+        "Wait for need bytes of free space, woken by credits from the reader"
+        def free():
+            return self.capacity - (self.head - self.load(TAIL)) >= need
+        while not free():
+            if not self.wait(WRITER_WAITING, free, self.credit):
+                raise BrokenPipeError("shared-memory reader closed")
+
+    def flush(self):
+        pass
+
+    def fileno(self) -> int:
+        raise OSError("ShmChannel has no pipe fd; use the threads engine without raw writes")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.store(CLOSED, 1)
+            self.notify(self.doorbell)
+        finally:
+            os.close(self.doorbell)
+            os.close(self.credit)
+            self.view.release()
+            self.buffer.close()
+
+@dataclass
+class ShmReader(Ring):
+    """
+    Consumer end, for the child. Iterating yields each record as a
+    memoryview into shared memory, valid until the next one is read.
+    """
+    doorbell: int = -1
+    credit: int = -1
+
+    def __post_init__(self):
+        super().__post_init__()
+        os.set_blocking(self.credit, False)
+        os.set_blocking(self.doorbell, False)
+        self.tail = self.load(TAIL)
+        self.held = 0
+
+    @staticmethod
+    def from_env(name: str) -> "ShmReader":
+        "Open the ShmChannel passed to this process as sidein channel name"
+        fd, doorbell, credit = map(int, os.environ[name].split(","))
+        return ShmReader(fd, doorbell = doorbell, credit = credit)
+
+    def read(self) -> memoryview | None:
+        "Release the previous record and return the next, or None at EOF"
+        self.release()
+        while True:
+            if self.tail < self.load(HEAD):
+                offset = self.tail % self.capacity
+                length = self.load(DATA + offset)
+                if length == WRAP:
+                    self.held = self.capacity - offset
+                    self.release()
+                    continue
+                start = DATA + offset + LENGTH.size
+                self.held = padded(length)
+                return self.view[start:start + length]
+            if self.load(CLOSED):
+                if self.tail < self.load(HEAD):
+                    continue
+                return None
+            published = lambda: self.tail < self.load(HEAD) or self.load(CLOSED)
+            if not self.wait(READER_WAITING, published, self.doorbell) and not published():
+                return None
+
+    def release(self):
+        "Return the current record's space to the writer"
+        if not self.held:
+            return
+        self.tail += self.held
+        self.held = 0
+        self.store(TAIL, self.tail)
+        if self.load(WRITER_WAITING):
+            self.notify(self.credit)
+
+    def __iter__(self) -> Iterator[memoryview]:
+        while (record := self.read()) is not None:
+            yield record
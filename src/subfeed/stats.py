@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Literal
+
+@dataclass
+class ChannelStats:
+    "Counters kept by a Writer, plus its queue depth at snapshot time"
+    items: int = 0            # Batches fully written
+    bytes: int = 0            # Encoded bytes written
+    filter_time: float = 0.   # Seconds spent in filter/encode
+    write_time: float = 0.    # Seconds blocked in write/flush on the pipe
+    queue_depth: int = 0
+
+    def snapshot(self, queue_depth: int) -> "ChannelStats":
+        return replace(self, queue_depth = queue_depth)
+
+@dataclass
+class WorkerStats:
+    id: Any
+    pid: int | None
+    alive: bool
+    returncode: int | None
+    taken: int                # Batches taken from the common queue or inbox
+    source_depth: int         # Inbox depth under routed dispatch, else 0
+    channels: Dict[str, ChannelStats] = field(default_factory = dict)
+
+@dataclass
+class Stats:
+    time: float
+    fed: int                  # Items passed to feed()
+    feed_time: float          # Seconds feed() spent blocked
+    common_depth: int
+    size: int = 0             # Tasks online or starting, excluding retired
+    memory_used: int = 0      # Bytes held against memory_budget, if set
+    memory_peak: int = 0
+    workers: List[WorkerStats] = field(default_factory = list)
+
+    @property
+    def items_written(self) -> Dict[str, int]:
+        "Batches written per channel, summed over workers"
+        totals: Dict[str, int] = {}
+        for worker in self.workers:
+            for name, channel in worker.channels.items():
+                totals[name] = totals.get(name, 0) + channel.items
+        return totals
+
+@dataclass
+class ScalingEvent:
+    "A task added (up) or retired (down) by the autoscaler"
+    time: float
+    action: Literal["up", "down"]
+    size: int                 # Pool size after the event
+    backlog: int              # Common queue depth that triggered it
+
+@dataclass
+class Failure:
+    "A task the supervisor found dead"
+    time: float
+    id: Any
+    returncode: int | None
+    delivered: int            # Batches written to it, which it may not have processed
+    replayed: int             # Batches requeued for other workers
+    dropped: int              # Batches given up on
+    restarted: bool           # False once max_restarts is reached
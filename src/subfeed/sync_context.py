@@ -12,16 +12,20 @@ from subprocess import Popen, PIPE
 
 EventField = field(default_factory=Event)
 
-@dataclass
-class SyncContext:
-    common: Queue = field(default_factory = Queue)
+# End-of-input marker. close() queues one per task behind the data; each
+# Worker forwards the one it takes to its writers and stops taking.
+EOF = object()
 
-    # Events
-    eof: Event = EventField
+def requeue(queue: Queue, items: List[Any]):
+    """
+    Put items back at the head of queue, in order and even if it is full,
+    so batches a dead worker took are still delivered before any EOF.
+    """
+    with queue.mutex:
+        queue.queue.extendleft(reversed(items))
+        queue.unfinished_tasks += len(items)
+        queue.not_empty.notify(len(items))
 
-    def exhausted(self, *queues: Iterable[Queue]) -> bool:
-        eof = self.eof.is_set()
-        no_tasks = all([
-            q.unfinished_tasks == 0 for q in [self.common, *queues]
-        ])
-        return eof and no_tasks
\ No newline at end of file
+@dataclass
+class SyncContext:
+    common: Queue = field(default_factory = Queue)
\ No newline at end of file
@@ -9,7 +9,20 @@ from subprocess import Popen, PIPE
 import os
 from abc import ABC, abstractmethod
 import io
+import re
+import shlex
+import shutil
+from functools import lru_cache
 from .channel import *
+from .remote import start_remote
+from .placement import parse_cpus, preexec
+
+# Characters that make a command string need /bin/sh
+SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\\n*?\[\]~{}#]")
+
+@lru_cache(maxsize = None)
+def executable(name: str) -> bool:
+    return shutil.which(name) is not None
 
 @dataclass
 class TaskTemplate:
@@ -18,12 +31,36 @@ class TaskTemplate:
     stdout: Channel | None = subprocess_pipe("stdout")
     stderr: Channel | None = subprocess_pipe("stderr")
     sidein: Dict[str, Channel] = field(default_factory = dict)
+    sideout: Dict[str, Channel] = field(default_factory = dict)
+
+    # Default pipe buffer size for AnonChannels and SubprocessPipes that do
+    # not set their own pipe_size.
+    pipe_size: int | None = None
+
+    # Address of a subfeed agent to run the task on (see subfeed.agent),
+    # or None to run it locally. Pipe channels are relayed over sockets,
+    # and FileChannel paths refer to the agent's host.
+    agent: str | None = None
+
+    # Scheduling of the child: the CPUs it may run on (a cpulist string,
+    # which may use the bind, e.g. "{id}", or CPU numbers), its nice value
+    # and its I/O priority as (class, level) (see subfeed.placement).
+    cpus: str | Iterable[int] | None = None
+    nice: int | None = None
+    ioprio: tuple[int, int] | None = None
 
     @property
     def std(self) -> Dict[Literal["stdin", "stdout", "stderr"], Channel]:
         std = {"stdin": self.stdin, "stdout": self.stdout, "stderr": self.stderr}
         return {k: v for k, v in std.items() if isinstance(v, Channel)}
 
+    @property
+    def outputs(self) -> Dict[str, Channel]:
+        "Channels the subprocess writes to"
+        std = {"stdout": self.stdout, "stderr": self.stderr}
+        std = {k: v for k, v in std.items() if isinstance(v, Channel)}
+        return {**std, **self.sideout}
+
 @dataclass
 class Mode:
     parent: str = "wb"
@@ -31,6 +68,7 @@ class Mode:
 
 @dataclass
 class Task(TaskTemplate):
+    bind: Dict = field(default_factory = dict)
     process: Popen | None = field(init = False)
 
     @staticmethod
@@ -38,11 +76,11 @@ class Task(TaskTemplate):
         task = copy.deepcopy(template)
         match task.args:
             case str(): task.args = task.args.format(**bind)
-            case list(): task.args = [task.arg.format(**bind) for arg in template.args]
+            case list(): task.args = [arg.format(**bind) for arg in template.args]
             case _: raise TypeError("args must be str or list of strings")
 
-        for name, channel in {**task.std, **task.sidein}.items():
-            
+        for name, channel in {**task.std, **task.sidein, **task.sideout}.items():
+
             if isinstance(channel, PathChannel):
                 channel.path = str(channel.path).format(**bind)
         return Task(
@@ -50,32 +88,62 @@ class Task(TaskTemplate):
             stdin = task.stdin,
             stdout = task.stdout,
             stderr = task.stderr,
-            sidein = task.sidein
+            sidein = task.sidein,
+            sideout = task.sideout,
+            pipe_size = task.pipe_size,
+            agent = task.agent.format(**bind) if task.agent else None,
+            cpus = task.cpus.format(**bind) if isinstance(task.cpus, str) else task.cpus,
+            nice = task.nice,
+            ioprio = task.ioprio,
+            bind = bind
         )
 
     def create_channels(self):
+        if self.agent:
+            # The agent creates them on its host
+            return
+        if self.pipe_size:
+            for channel in self.channels.values():
+                if getattr(channel, "pipe_size", 0) is None:
+                    channel.pipe_size = self.pipe_size
         for channel in self.std.values():
             channel.create()
         for channel in self.sidein.values():
             channel.create()
+        for channel in self.sideout.values():
+            channel.create()
 
     def start(self, modes: Dict[str, Mode] = None):
         modes = modes or {}
-        env = os.environ.copy()
-        pass_fds = self._pass_fds(env)
         modes.setdefault("stdin", Mode(parent = "w", child = "r"))
         modes.setdefault("stdout", Mode(parent = "r", child = "w"))
         modes.setdefault("stderr", Mode(parent = "r", child = "w"))
+        for name in self.sidein:
+            modes.setdefault(name, Mode())
+        for name in self.sideout:
+            modes.setdefault(name, Mode(parent = "rb", child = "wb"))
+        if self.agent:
+            start_remote(self, modes)
+            return
 
+        env = os.environ.copy()
+        pass_fds = self._pass_fds(env)
+
+        args, shell = self.command()
         self.process = Popen(
-            args = self.args,
-            shell = isinstance(self.args, str),
+            args = args,
+            shell = shell,
             stdin = self.stdin.init_process(modes["stdin"].child),
             stdout = self.stdout.init_process(modes["stdout"].child),
             stderr = self.stderr.init_process(modes["stderr"].child),
             env = env,
             pass_fds = pass_fds,
-            close_fds = True
+            close_fds = True,
+            preexec_fn = preexec(
+                parse_cpus(self.cpus) if self.cpus is not None else None,
+                self.nice,
+                self.ioprio
+            )
         )
         for name, channel in self.std.items():
             if isinstance(channel, SubprocessPipe):
@@ -84,16 +152,54 @@ class Task(TaskTemplate):
                 channel.open(modes["stdin"].parent)
             else:
                 channel.open(modes[name].parent)
-        for name, channel in self.sidein.items():
+        for name, channel in {**self.sidein, **self.sideout}.items():
             channel.open(mode=modes[name].parent)
 
+    def command(self) -> tuple[str | List[str], bool]:
+        """
+        Args for Popen and whether they need the shell. A string of plain
+        words naming an executable is split and exec'd directly, saving a
+        /bin/sh process per task.
+        """
+        if not isinstance(self.args, str):
+            return self.args, False
+        if SHELL_SYNTAX.search(self.args):
+            return self.args, True
+        argv = shlex.split(self.args)
+        # Builtins (exit, read...) and leading VAR=value assignments
+        if not argv or "=" in argv[0] or not executable(argv[0]):
+            return self.args, True
+        return argv, False
+
+    @property
+    def channels(self) -> Dict[str, Channel]:
+        return {**self.std, **self.sidein, **self.sideout}
+
+    @property
+    def pipe_sizes(self) -> Dict[str, int | None]:
+        "Effective pipe buffer size of each pipe channel, once opened"
+        return {
+            name: channel.effective_pipe_size
+            for name, channel in self.channels.items()
+            if hasattr(channel, "effective_pipe_size")
+        }
 
     def _pass_fds(self, env: Dict[str,str]) -> List[int]:
         pass_fds = []
         for name, channel in self.sidein.items():
             match channel:
-                case AnonChannel(): fd = channel.r
-                case PathChannel(): fd = os.open(channel.path, os.O_RDONLY)
+                case ShmChannel(): fds = list(channel.child_fds)
+                case AnonChannel(): fds = [channel.r]
+                case PathChannel(): fds = [os.open(channel.path, os.O_RDONLY)]
+            pass_fds.extend(fds)
+            env[name] = ",".join(map(str, fds))
+        for name, channel in self.sideout.items():
+            match channel:
+                case AnonChannel(): fd = channel.w
+                # A respawned Task keeps what its predecessor wrote
+                case FileChannel(append = True):
+                    fd = os.open(channel.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+                case PathChannel(): fd = os.open(channel.path, os.O_WRONLY)
             pass_fds.append(fd)
             env[name] = str(fd)
         return pass_fds
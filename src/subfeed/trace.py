@@ -0,0 +1,191 @@
+"""
+Sampled per-batch tracing (see Coordinator.trace_rate).
+
+A sampled batch is wrapped in Traced from feed() until each channel's
+Writer takes it, and its Trace is stamped at every stage on the way:
+
+    fed      feed() called
+    queued   put in the common queue (or a worker's inbox)
+    taken    taken by a Worker
+    per channel: dequeued by its Writer, encoded, written
+
+Unsampled batches are never wrapped, so tracing costs one countdown per
+feed() and one type check per queue hop.
+"""
+import json
+import math
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Tuple
+
+@dataclass
+class Trace:
+    "perf_counter() stamps of one sampled batch"
+    batch: int
+    fed: float
+    queued: float | None = None
+    taken: float | None = None
+    worker: int | None = None
+    # Channel name -> [dequeued, encoded, written], appended as they happen
+    channels: Dict[str, List[float]] = field(default_factory = dict)
+
+    def stages(self) -> Iterator[Tuple[str, str | None, float, float]]:
+        "(stage, channel, start, end) of each completed stage, in order"
+        if self.queued is None:
+            return
+        # The worker can take the batch before feed() stamps it queued
+        queued = self.queued if self.taken is None else min(self.queued, self.taken)
+        yield "feed", None, self.fed, queued
+        if self.taken is None:
+            return
+        yield "common", None, queued, self.taken
+        for name, stamps in self.channels.items():
+            for stage, start, end in zip(("queue", "filter", "write"), [self.taken, *stamps], stamps):
+                yield stage, name, start, end
+
+    @property
+    def done(self) -> float | None:
+        "When the last channel wrote the batch, or None if still in flight"
+        if self.taken is None or not self.channels:
+            return None
+        if any(len(stamps) < 3 for stamps in self.channels.values()):
+            return None
+        return max(stamps[2] for stamps in self.channels.values())
+
+@dataclass
+class Traced:
+    "A fed item sampled for tracing"
+    trace: Trace
+    item: Any
+
+def untraced(item: Any) -> Any:
+    return item.item if type(item) is Traced else item
+
+@dataclass
+class Histogram:
+    """
+    Latencies counted in power-of-two buckets: bucket b holds those under
+    2**b microseconds and at least half that.
+    """
+    counts: Dict[int, int] = field(default_factory = dict)
+    count: int = 0
+    total: float = 0.
+    max: float = 0.
+
+    def add(self, seconds: float):
+        bucket = int(seconds * 1e6).bit_length()
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.
+
+    def percentile(self, q: float) -> float:
+        "Upper bound in seconds of the bucket holding the q-th percentile"
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def __str__(self) -> str:
+        lines = [f"n={self.count} mean={self.mean * 1e6:.0f}us p50<={self.percentile(50) * 1e6:.0f}us "
+                 f"p99<={self.percentile(99) * 1e6:.0f}us max={self.max * 1e6:.0f}us"]
+        peak = max(self.counts.values(), default = 1)
+        for bucket in sorted(self.counts):
+            count = self.counts[bucket]
+            lines.append(f"  <{1 << bucket:>10}us {count:>8} {'#' * math.ceil(40 * count / peak)}")
+        return "\n".join(lines)
+
+class Tracer:
+    """
+    Samples fed batches at rate and keeps the traces of the most recent
+    limit of them. The gap to the next sample is drawn geometrically, so
+    an unsampled feed() only counts down.
+    """
+
+    def __init__(self, rate: float, limit: int = 100_000, seed: int | None = None):
+        if not 0 < rate <= 1:
+            raise ValueError("trace rate must be in (0, 1]")
+        self.rate = rate
+        self.traces: deque[Trace] = deque(maxlen = limit)
+        self.random = random.Random(seed)
+        self.origin = perf_counter()
+        self.sampled = 0
+        self.countdown = self._gap()
+
+    def _gap(self) -> int:
+        if self.rate >= 1:
+            return 1
+        return int(math.log(1. - self.random.random()) / math.log(1. - self.rate)) + 1
+
+    def sample(self) -> Trace | None:
+        "Called by feed(): a new Trace if this batch is sampled, else None"
+        self.countdown -= 1
+        if self.countdown > 0:
+            return None
+        self.countdown = self._gap()
+        trace = Trace(self.sampled, perf_counter())
+        self.sampled += 1
+        self.traces.append(trace)
+        return trace
+
+    def histograms(self, per_worker: bool = False) -> Dict[Any, Histogram]:
+        """
+        Latency of each stage, keyed by stage name ("channel.stage" for
+        per-channel stages, and "total" from feed() to the last write),
+        or by (stage, worker id) with per_worker.
+        """
+        histograms: Dict[Any, Histogram] = {}
+        def add(stage: str, trace: Trace, seconds: float):
+            key = (stage, trace.worker) if per_worker else stage
+            histograms.setdefault(key, Histogram()).add(seconds)
+
+        for trace in list(self.traces):
+            for stage, channel, start, end in trace.stages():
+                add(stage if channel is None else f"{channel}.{stage}", trace, end - start)
+            done = trace.done
+            if done is not None:
+                add("total", trace, done - trace.fed)
+        return histograms
+
+    def chrome(self) -> Dict[str, Any]:
+        """
+        Traces in the Chrome trace event format, for chrome://tracing or
+        ui.perfetto.dev. Each worker is a process; each batch is an async
+        track with its feed and common-queue stages, plus one track per
+        channel with its queue, filter and write stages.
+        """
+        events = []
+        workers = set()
+        def span(name: str, id: str, pid: int, start: float, end: float, args: Dict[str, Any]):
+            base = {"name": name, "cat": "subfeed", "id": id, "pid": pid, "tid": 0}
+            events.append({**base, "ph": "b", "ts": (start - self.origin) * 1e6, "args": args})
+            events.append({**base, "ph": "e", "ts": (end - self.origin) * 1e6})
+
+        for trace in list(self.traces):
+            pid = -1 if trace.worker is None else trace.worker
+            workers.add(pid)
+            args = {"batch": trace.batch}
+            for stage, channel, start, end in trace.stages():
+                if channel is None:
+                    span(stage, str(trace.batch), pid, start, end, args)
+                else:
+                    span(f"{channel} {stage}", f"{trace.batch}.{channel}", pid, start, end, args)
+
+        for pid in sorted(workers):
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                           "args": {"name": "not taken" if pid == -1 else f"worker {pid}"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        "Write chrome() as JSON to path"
+        with open(path, "w") as f:
+            json.dump(self.chrome(), f)
@@ -1,6 +1,6 @@
 import copy
 from subprocess import Popen
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from queue import Queue, Empty
 from dataclasses import dataclass, field
 from typing import IO, Callable, List, Any, Literal, Dict, Iterable
@@ -9,16 +9,44 @@ from subprocess import Popen, PIPE
 import os
 from abc import ABC, abstractmethod
 import io
-from .sync_context import SyncContext
+from .sync_context import SyncContext, EOF, requeue
 from .channel import Channel
 from .task import Task
-from .writer import Writer
+from .writer import Writer, Broadcast, SKIP
+from .reader import Reader
+from .reorder import Sequenced
+from .chunk import record_count
+from .budget import MemoryBudget
+from .trace import Traced
+from .stats import ChannelStats, WorkerStats
+from collections import deque
+from time import perf_counter
 
 @dataclass
 class Worker:
     context: SyncContext
     writers: Dict[str, Writer]
-    timeout = 1.
+    readers: Dict[str, Reader] = field(default_factory = dict)
+
+    # Queue this worker takes batches from: the shared common queue, or
+    # its own inbox when the Coordinator routes batches itself.
+    source: Queue | None = None
+
+    # The Task whose channels the writers feed, for liveness and stats
+    task: Task | None = None
+
+    # (next seq, records left) for each Sequenced batch taken, oldest first
+    sequence: deque = field(default_factory = deque)
+
+    # Batches dispatched but not yet written to every channel, oldest
+    # first, kept for replay if the process dies. None disables it.
+    log: deque | None = None
+
+    # Memory bound (see Coordinator.memory_budget): each batch holds
+    # sizer(batch) of budget from feed() until every channel has encoded
+    # it. None disables the accounting.
+    budget: MemoryBudget | None = None
+    sizer: Callable[[Any], int] | None = None
     thread: Thread = field(init=False)
     
     # Events
@@ -28,10 +56,13 @@ class Worker:
         context: SyncContext, 
         task: Task, 
         writer_types: Dict[str, Writer] = None,
-        maxsize: int = 2
+        maxsize: int = 2,
+        writer_options: Dict[str, Dict[str, Any]] = None,
+        source: Queue | None = None
     ) -> "Worker":
         if writer_types is None:
             writer_types = {"stdin": Writer}
+        writer_options = writer_options or {}
         write_channels = {}
         writers: Dict[str, Writer] = {}
         if task.stdin:
@@ -53,41 +84,237 @@ class Worker:
                     writers[name] = WriterType(
                         context = context, 
                         io = channel.io, 
-                        queue = Queue(maxsize=maxsize)
+                        queue = Queue(maxsize=maxsize),
+                        name = name,
+                        **writer_options.get(name, {})
                     )
 
         return Worker(
             context = context,
-            writers = writers
+            writers = writers,
+            source = source,
+            task = task
         )
     
     def start(self):
         self.thread.start()
         for writer in self.writers.values():
             writer.start()
+        self.start_readers()
+
+    def start_readers(self):
+        for reader in self.readers.values():
+            reader.start()
 
     def take(self):
-        while not self.exhausted():
-            try:
-                batch = self.context.common.get(timeout=self.timeout)
-
-                # Fan out to all writers
-                for writer in self.writers.values():
-                    writer.queue.put(batch)
-
-                self.context.common.task_done()
-            except Empty:
-                continue
-
-    def exhausted(self, *names: List[str]) -> bool:
-        if not names:
-            names = list(self.writers.keys())
-        queues = [
-            writer.queue
-            for name, writer in self.writers.items()
-            if name in names
-        ]
-        return self.context.exhausted(*queues)
+        while not self.finished:
+            batch = self.source.get()
+            if not self.dispatch(batch):
+                # Died meanwhile: hand the batch back to healthy workers
+                requeue(self.source, [batch])
+            self.source.task_done()
+
+    def dispatch(self, batch) -> bool:
+        "Fan out to all writers. Returns False if this worker is dead."
+        if self.log is not None:
+            with self.lock:
+                if self.dead:
+                    return False
+                if batch is not EOF:
+                    self.trim()
+                    self.log.append(batch)
+        if batch is EOF:
+            # Channels that must be exhausted first, so a full queue on a
+            # channel the child ignores cannot hold back their EOF.
+            for writer in sorted(self.writers.values(), key = lambda w: not w.exhaust):
+                writer.queue.put(EOF)
+            self.finished = True
+            return True
+        if isinstance(batch, Broadcast):
+            self.charge(0)
+            for name, writer in self.writers.items():
+                writer.queue.put(batch.outputs.get(name, SKIP))
+            return True
+        trace = None
+        if type(batch) is Traced:
+            trace, batch = batch.trace, batch.item
+            trace.taken = perf_counter()
+            trace.worker = self.id
+        if isinstance(batch, Sequenced):
+            self.sequence.append([batch.seq, record_count(batch.item)])
+            batch = batch.item
+        self.taken += 1
+        self.charge(self.sizer(batch) if self.budget is not None else 0)
+        # Writers stamp a sampled batch's channel stages
+        if trace is not None:
+            batch = Traced(trace, batch)
+        for writer in self.writers.values():
+            writer.queue.put(batch)
+        return True
+
+    def preload(self, broadcasts: List[Broadcast]):
+        "Queue broadcasts ahead of any batch. Call before starting the worker."
+        for name, writer in self.writers.items():
+            requeue(writer.queue, [b.outputs.get(name, SKIP) for b in broadcasts])
+        for _ in broadcasts:
+            self.charge(0)
+        if self.log is not None:
+            self.log.extend(broadcasts)
+
+    def charge(self, size: int):
+        "Record the budget a batch holds, before any writer can take it"
+        if self.budget is not None:
+            with self.lock:
+                self.charges.append(size)
+
+    def release(self):
+        """
+        Return the budget of batches that every channel still writing has
+        encoded. Called by the writers as they encode.
+        """
+        size = 0
+        with self.lock:
+            started = min(
+                (w.started for w in self.writers.values() if not w.broken),
+                default = self.released + len(self.charges)
+            )
+            while self.released < started and self.charges:
+                size += self.charges.popleft()
+                self.released += 1
+        self.budget.release(size)
+
+    def trim(self):
+        "Forget logged batches that every channel has written"
+        completed = self.completed
+        while self.logged < completed and self.log:
+            self.log.popleft()
+            self.logged += 1
+
+    def abandon(self, delivery: Literal["at_least_once", "at_most_once"]) -> tuple[List[Any], int]:
+        """
+        Mark this worker dead and stop it taking batches. Returns the
+        logged batches to replay elsewhere, and how many were dropped:
+        at_least_once replays every batch not written to all channels,
+        at_most_once only those no channel had started writing.
+        """
+        with self.lock:
+            self.dead = True
+            self.finished = True
+            self.trim()
+            if delivery == "at_most_once":
+                started = max((w.started for w in self.writers.values()), default = 0)
+                skip = max(started - self.logged, 0)
+            else:
+                skip = 0
+            batches = list(self.log)[skip:]
+            self.log.clear()
+            # Replayed batches are charged again when requeued
+            if self.budget is not None:
+                self.budget.release(sum(self.charges))
+                self.released += len(self.charges)
+                self.charges.clear()
+
+        # Unblock a take thread stuck on a full queue and a writer thread
+        # waiting for input, so both can exit. A waiting put() only
+        # rechecks the size, so the limit is raised rather than removed.
+        for writer in self.writers.values():
+            with writer.queue.not_full:
+                writer.queue.maxsize = sys.maxsize
+                writer.queue.not_full.notify_all()
+            writer.queue.put(EOF)
+        return batches, skip
+
+    def join(self, names: Iterable[str]):
+        "Wait until the named writers have written their EOF"
+        for name in names:
+            if name in self.writers:
+                self.writers[name].thread.join()
+
+    def ready(self) -> bool:
+        "True if every writer queue can accept a batch without blocking"
+        return not any(writer.queue.full() for writer in self.writers.values())
+
+    def next_seq(self) -> int:
+        """
+        Sequence number of the next output record, assuming the subprocess
+        emits exactly one output record per input record, in order.
+        """
+        try:
+            entry = self.sequence[0]
+        except IndexError:
+            raise RuntimeError(
+                "ordered output requires one output record per input record"
+            ) from None
+        seq = entry[0]
+        entry[0] += 1
+        entry[1] -= 1
+        if entry[1] == 0:
+            self.sequence.popleft()
+        return seq
+
+    def assign(self, size: int):
+        "Account for a batch routed to this worker's inbox"
+        self.assigned += 1
+        self.inflight.append(size)
+        self.inflight_bytes += size
+
+    @property
+    def id(self) -> Any:
+        "The task's bind id, e.g. its {id}"
+        return next(iter(self.task.bind.values()), None) if self.task else None
+
+    @property
+    def completed(self) -> int:
+        "Batches written to every channel"
+        return min((w.written for w in self.writers.values()), default = 0)
+
+    @property
+    def drained(self) -> int:
+        "Batches every channel has written, or dropped after an ignored broken pipe"
+        return min((w.written + w.dropped for w in self.writers.values()), default = 0)
+
+    def settle(self):
+        "Release accounting for batches that every channel is done with"
+        completed = self.drained
+        while self.settled < completed and self.inflight:
+            self.inflight_bytes -= self.inflight.popleft()
+            self.settled += 1
+
+    @property
+    def outstanding(self) -> int:
+        "Assigned batches not yet written to every channel"
+        return self.assigned - self.settled
+
+    def stats(self) -> WorkerStats:
+        process = self.task.process if self.task else None
+        returncode = process.poll() if process else None
+        return WorkerStats(
+            id = self.id,
+            pid = process.pid if process else None,
+            alive = process is not None and returncode is None,
+            returncode = returncode,
+            taken = self.taken,
+            source_depth = 0 if self.source is self.context.common else self.source.qsize(),
+            channels = {
+                name: writer.stats.snapshot(writer.queue.qsize())
+                if writer.stats is not None
+                else ChannelStats(queue_depth = writer.queue.qsize())
+                for name, writer in self.writers.items()
+            }
+        )
 
     def __post_init__(self):
+        if self.source is None:
+            self.source = self.context.common
+        self.taken = 0
+        self.finished = False
+        self.dead = False
+        self.lock = Lock()
+        self.logged = 0
+        self.assigned = 0
+        self.settled = 0
+        self.inflight = deque()
+        self.inflight_bytes = 0
+        self.charges = deque()
+        self.released = 0
         self.thread = Thread(target = self.take, daemon = True)
\ No newline at end of file
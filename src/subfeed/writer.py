@@ -3,63 +3,347 @@ from subprocess import Popen
 from threading import Thread, Event
 from queue import Queue, Empty
 from dataclasses import dataclass, field
-from typing import IO, Callable, List, Any, Literal, Dict, Iterable
+from typing import IO, Callable, List, Any, Literal, Dict, Iterable, Iterator, Type
+from concurrent.futures import Executor, Future
+from collections import deque
 import sys
 from subprocess import Popen, PIPE
 import os
 from abc import ABC, abstractmethod
 import io
-from .sync_context import SyncContext
+import time
+from time import perf_counter
+from .sync_context import SyncContext, EOF
+from .chunk import Chunk, Block, default_sizer
+from .budget import MemoryBudget
+from .rawio import FileRegion, write_all
+from .channel import BROKEN_PIPE
+from .stats import ChannelStats
+from .trace import Traced
 
 def identity(self, batch):
     return batch
 
+@dataclass
+class Encoded:
+    "Output encoded ahead of time, written as is. None writes nothing."
+    output: Any
+
+# Queued to channels a Broadcast leaves out, keeping every writer's
+# written count in step with the Worker's batches
+SKIP = Encoded(None)
+
+@dataclass
+class Broadcast:
+    "An item encoded once per channel by Coordinator.broadcast()"
+    outputs: Dict[str, Encoded]
+
+def encode(writer_type: Type["Writer"], batch):
+    """
+    Encode a batch in a filter pool process. The Writer is never
+    initialized there, so filter() must not depend on its state.
+    """
+    return writer_type.__new__(writer_type).encode(batch)
+
 @dataclass
 class Writer:
     context: SyncContext
     io: IO
     queue: Queue = field(default_factory = Queue)
     ignore_broken_pipe: bool = False
-    timeout = 1.
-    thread: Thread = field(init = False)
+
+    # close() waits for this channel to be written to the end
+    exhaust: bool = True
+
+    # Coalescing: drain up to coalesce_bytes of filtered output from the
+    # queue, waiting at most linger seconds for more, then write once.
+    # coalesce_bytes = 0 writes and flushes every batch individually.
+    coalesce_bytes: int = 0
+    linger: float = 0.
+
+    # Batches fully written, and an optional hook called with the number
+    # of batches completed by each write.
+    written: int = 0
+    on_written: Callable[[int], Any] | None = None
+
+    # Raw mode: os.writev outputs straight to the fd, skipping the file
+    # object's buffer copy and joining of coalesced outputs.
+    raw: bool = False
+
+    # Process pool that runs encode() off the GIL (see Coordinator.filter_pool)
+    pool: Executor | None = None
+    pool_depth: int = 4
+
+    # Counters, or None when metrics are switched off
+    stats: ChannelStats | None = None
+
+    # Memory bound (see Coordinator.memory_budget): encoded outputs count
+    # against budget, as estimated by sizer, until written. on_encoded is
+    # called once each batch has been encoded and can be let go.
+    budget: MemoryBudget | None = None
+    sizer: Callable[[Any], int] = default_sizer
+    on_encoded: Callable[[], Any] | None = None
+
+    # Channel name, under which sampled batches are stamped (see Tracer)
+    name: str = ""
+    thread: Thread | None = field(init = False, default = None)
 
     # Events
 
     def start(self):
+        # Only a started Writer has a thread; the epoll engine and
+        # AsyncCoordinator drive theirs directly.
+        self.thread = Thread(target = self.write, daemon = True)
         self.thread.start()
 
     def write(self):
-        while not self.exhausted():
+        produce = self.pooled if self.pool is not None else self.gathered
+        for outputs in produce():
             try:
-                batch = self.queue.get(timeout = self.timeout)
-                try:
-                    output = self.filter(batch)
-                    self.io.write(output)
-                    self.io.flush()
+                if outputs:
+                    self.emit(outputs)
+                for _ in outputs:
                     self.queue.task_done()
-                except BrokenPipeError:
-                    if self.ignore_broken_pipe:
-                        break
-                    else:
-                        raise
-            except Empty:
-                continue
+                self.complete(len(outputs))
+            except BROKEN_PIPE:
+                self.broken = True
+                # Batches this writer will never take no longer wait on it
+                if self.on_encoded is not None:
+                    self.on_encoded()
+                if self.ignore_broken_pipe:
+                    for _ in outputs:
+                        self.queue.task_done()
+                    self.drop(len(outputs))
+                    break
+                else:
+                    raise
+            finally:
+                if self.budget is not None:
+                    self.release(outputs)
 
         # Close input to unblock processes that are waiting on EOF for it
         try:
             self.io.close()
-        except BrokenPipeError as e:
+        except BROKEN_PIPE as e:
             if self.ignore_broken_pipe:
                 pass
             else:
                 raise
 
+        # After an ignored broken pipe, keep draining so the Worker never
+        # blocks on this channel.
+        if self.broken:
+            self.discard()
+
+    def discard(self):
+        "Take and drop batches up to EOF"
+        while not self.finished:
+            batch = self.queue.get()
+            if not self.at_eof(batch):
+                self.queue.task_done()
+                self.drop(1)
+
+    def emit(self, outputs: List[Any]):
+        """
+        Write outputs and flush. In raw mode, or for FileRegions, bypass
+        the file object and write straight to its fd.
+        """
+        if None in outputs:
+            outputs = [o for o in outputs if o is not None]
+            if not outputs:
+                return
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+
+        if not self.raw and not any(isinstance(o, FileRegion) for o in outputs):
+            self.io.write(self.join(outputs))
+            self.io.flush()
+        else:
+            self.io.flush()
+            encoding = getattr(self.io, "encoding", None) or "utf-8"
+            write_all(self.io.fileno(), [
+                o.encode(encoding) if isinstance(o, str) else o
+                for o in outputs
+            ])
+
+        if stats is not None:
+            stats.write_time += perf_counter() - start
+            stats.bytes += len(outputs[0]) if len(outputs) == 1 else sum(map(len, outputs))
+
+    def gathered(self) -> Iterator[List[Any]]:
+        while not self.finished:
+            yield self.gather()
+
+    def pooled(self) -> Iterator[List[Any]]:
+        """
+        Encode batches in the filter pool, keeping up to pool_depth in
+        flight, and yield their outputs in queue order.
+        """
+        pending = deque()
+        while pending or not self.finished:
+            if not self.finished and len(pending) < self.pool_depth:
+                try:
+                    batch = self.queue.get(block = not pending)
+                except Empty:
+                    pass
+                else:
+                    if isinstance(batch, Encoded):
+                        self.started += 1
+                        pending.append((future := Future(), None))
+                        future.set_result(batch.output)
+                    elif not self.at_eof(batch):
+                        self.started += 1
+                        stamps = None
+                        if type(batch) is Traced:
+                            stamps = batch.trace.channels[self.name] = [perf_counter()]
+                            batch = batch.item
+                        pending.append((self.pool.submit(encode, type(self), batch), stamps))
+                    continue
+            future, stamps = pending.popleft()
+            output = self.timed(future.result)
+            if stamps is not None:
+                stamps.append(perf_counter())
+                self.stamps.append(stamps)
+            yield [self.hold(output)]
+
+    def gather(self) -> List[Any]:
+        """
+        Block for one batch, then coalesce whatever else is available.
+        Returns the filtered output of each batch taken from the queue,
+        which is empty if the first one was EOF.
+        """
+        outputs = []
+        size = 0
+        batch = self.queue.get()
+        # Linger from the first batch's arrival, however long the wait for it
+        deadline = time.monotonic() + self.linger
+        while not self.at_eof(batch):
+            output = self.process(batch)
+            outputs.append(output)
+            if self.coalesce_bytes <= 0:
+                break
+            # None: a channel a broadcast skipped, which emit() leaves out
+            if output is not None:
+                size += len(output)
+            if size >= self.coalesce_bytes:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch = self.queue.get(timeout = remaining)
+                else:
+                    batch = self.queue.get_nowait()
+            except Empty:
+                break
+        return outputs
+
+    def at_eof(self, batch) -> bool:
+        "True, and marks this writer finished, if batch is the EOF marker"
+        if batch is not EOF:
+            return False
+        self.queue.task_done()
+        self.finished = True
+        return True
+
+    def process(self, batch):
+        "Encode a batch taken from the queue and hold its output"
+        self.started += 1
+        if type(batch) is not Traced:
+            return self.hold(self.timed(self.encode, batch))
+        stamps = batch.trace.channels[self.name] = [perf_counter()]
+        output = self.timed(self.encode, batch.item)
+        stamps.append(perf_counter())
+        self.stamps.append(stamps)
+        return self.hold(output)
+
+    def encode(self, batch):
+        "Filter a batch, a Chunk through filter_batch, or a Block through filter_block"
+        match batch:
+            case Chunk(): return self.filter_batch(batch)
+            case Block(): return self.filter_block(batch)
+            case Encoded(): return batch.output
+            case _: return self.filter(batch)
+
+    def filter_block(self, block: "Block"):
+        """
+        Filter a Block of records from feed_from(). Without a filter or
+        filter_batch override the block is written as it was read; else
+        its records are split out and passed to filter_batch.
+        """
+        cls = type(self)
+        if cls.filter is Writer.filter and cls.filter_batch is Writer.filter_batch:
+            return block
+        return self.filter_batch(Chunk(block.records()))
+
+    def filter_batch(self, batch: List[Any]):
+        """
+        Filter every record of a Chunk into one output. Override to
+        vectorize encoding; the default joins filter() of each record.
+        """
+        return self.join([self.filter(record) for record in batch])
+
+    @staticmethod
+    def join(outputs: List[Any]):
+        if len(outputs) == 1:
+            return outputs[0]
+        if isinstance(outputs[0], str):
+            return "".join(outputs)
+        return b"".join(outputs)
+
+    def timed(self, encode: Callable, *args):
+        "Call encode, adding its duration to stats.filter_time"
+        if self.stats is None:
+            return encode(*args)
+        start = perf_counter()
+        output = encode(*args)
+        self.stats.filter_time += perf_counter() - start
+        return output
+
+    def hold(self, output):
+        "Count an encoded output against the budget; its batch can be let go"
+        if self.budget is not None:
+            self.budget.charge(self.sizer(output))
+        if self.on_encoded is not None:
+            self.on_encoded()
+        return output
+
+    def release(self, outputs: List[Any]):
+        "Return the budget held by outputs that have been written or dropped"
+        self.budget.release(sum(map(self.sizer, outputs)))
+
+    def complete(self, count: int):
+        self.written += count
+        if self.stamps:
+            now = perf_counter()
+            for stamps in self.stamps:
+                stamps.append(now)
+            self.stamps.clear()
+        if self.stats is not None:
+            self.stats.items += count
+        if self.on_written is not None:
+            self.on_written(count)
+
+    def drop(self, count: int):
+        """
+        Count batches dropped after an ignored broken pipe. They are not
+        written, but no longer hold a routed worker's room.
+        """
+        self.dropped += count
+        self.stamps.clear()
+        if self.on_written is not None:
+            self.on_written(count)
+
     def filter(self, batch):
         "Identity filter"
         return batch
-    
-    def exhausted(self) -> bool:
-        return self.context.exhausted(self.queue)
 
     def __post_init__(self):
-        self.thread = Thread(target = self.write, daemon = True)
+        # Batches taken from the queue, and whether a write hit a broken pipe
+        self.started = 0
+        self.broken = False
+        # Batches dropped after an ignored broken pipe
+        self.dropped = 0
+        # Stamps of sampled batches encoded but not yet written
+        self.stamps = []
+        self.finished = False
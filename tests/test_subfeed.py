@@ -1,6 +1,26 @@
+import pytest
+import os
+import subprocess
+import json
+import sys
+import time
+from threading import Thread
 from subfeed import *
 
-def test_line_numbers_fibonaccis():
+class TSVWriter(Writer):
+    "Module level so filter pool processes can unpickle it"
+    def filter(self, batch):
+        return ("\t".join(map(str, batch)) + "\n").encode()
+
+    def filter_batch(self, batch):
+        return "".join("\t".join(map(str, row)) + "\n" for row in batch).encode()
+
+class LineWriter(Writer):
+    def filter(self, batch):
+        return f"{batch}\n".encode()
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_line_numbers_fibonaccis(engine):
     # Define how to format data for the pipes
     class LineNumbersWriter(Writer):
         def filter(self, batch):
@@ -28,7 +48,7 @@ def test_line_numbers_fibonaccis():
     }
 
     # 3. Start the Swarm (2 concurrent processes)
-    with Coordinator(template, count=2, writer_specs=specs) as swarm:
+    with Coordinator(template, count=2, writer_specs=specs, engine=engine) as swarm:
         # Generate first 100 fibonacci sequence and indices
         fibs = [0, 1]
         for i in range(98):
@@ -49,4 +69,877 @@ def test_line_numbers_fibonaccis():
     
     from pathlib import Path
     Path("/tmp/0.out").unlink(missing_ok=True)
-    Path("/tmp/1.out").unlink(missing_ok=True)
\ No newline at end of file
+    Path("/tmp/1.out").unlink(missing_ok=True)
+
+def test_coalescing_writer(tmp_path):
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(LineWriter, coalesce_bytes=4096, linger=0.01)}
+
+    with Coordinator(template, count=2, writer_specs=specs) as swarm:
+        for i in range(1000):
+            swarm.feed(i)
+
+    output = (tmp_path / "0.out").read_text() + (tmp_path / "1.out").read_text()
+    assert sorted(int(line) for line in output.split()) == list(range(1000))
+
+    # Lingering starts when the first batch arrives, even after an idle spell
+    import io
+    from queue import Queue
+    from subfeed.sync_context import EOF
+    writes = []
+    class Recorder(io.BytesIO):
+        def write(self, data):
+            writes.append(bytes(data))
+            return len(data)
+    writer = LineWriter(context=SyncContext(Queue()), io=Recorder(), coalesce_bytes=4096, linger=0.5)
+    writer.start()
+    time.sleep(0.6)
+    writer.queue.put(1)
+    time.sleep(0.05)
+    writer.queue.put(2)
+    writer.queue.put(EOF)
+    writer.thread.join()
+    assert writes == [b"1\n2\n"]
+
+
+def test_feed_many(tmp_path):
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(LineWriter)}
+
+    with Coordinator(template, count=2, writer_specs=specs) as swarm:
+        swarm.feed_many(range(1000), chunk_size=64)
+
+    output = (tmp_path / "0.out").read_text() + (tmp_path / "1.out").read_text()
+    assert sorted(int(line) for line in output.split()) == list(range(1000))
+
+
+def test_async_coordinator(tmp_path):
+    import asyncio
+
+    class LineNumbersWriter(Writer):
+        def filter(self, batch):
+            return f"{batch[0]}\n".encode()
+
+    class TextWriter(Writer):
+        def filter(self, batch):
+            return f"{batch[1]}\n".encode()
+
+    template = TaskTemplate(
+        args="python tests/print_fibonaccis.py",
+        stdout=FileChannel(str(tmp_path / "{id}.out")),
+        sidein={"line_numbers": AnonChannel()}
+    )
+    specs = {
+        "stdin": WriterSpec(TextWriter),
+        "line_numbers": WriterSpec(LineNumbersWriter)
+    }
+
+    async def main():
+        async with AsyncCoordinator(template, count=2, writer_specs=specs) as swarm:
+            for line_number in range(1, 501):
+                await swarm.feed([line_number, line_number * line_number])
+        # The pumps drive the writers; none has a thread
+        assert all(w.thread is None for writers in swarm.writers for w in writers.values())
+
+    asyncio.run(main())
+
+    output = (tmp_path / "0.out").read_text() + (tmp_path / "1.out").read_text()
+    recovered = [[int(i) for i in line.split()] for line in output.splitlines()]
+    assert len(recovered) == 500
+    for line_number, square in recovered:
+        assert line_number * line_number == square
+
+
+def test_async_pump_errors():
+    import asyncio
+    specs = {"stdin": WriterSpec(Writer)}
+    batch = b"x" * 999 + b"\n"
+
+    # A child that exits at once breaks its exhaust channel: feed() raises
+    async def feed_forever(template):
+        async with AsyncCoordinator(template, count=1, writer_specs=specs) as swarm:
+            while True:
+                await swarm.feed(batch)
+
+    with pytest.raises(BrokenPipeError):
+        asyncio.run(asyncio.wait_for(feed_forever(TaskTemplate(args="true")), 10))
+
+    # Cancelling a blocked feed() closes the channels instead of queueing EOF
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(feed_forever(TaskTemplate(args="sleep 0.5")), 0.2))
+
+
+def test_async_linger(monkeypatch):
+    import asyncio
+    from subfeed.sync_context import EOF
+    writes = []
+    async def record(fd, output):
+        writes.append(output)
+    monkeypatch.setattr(AsyncCoordinator, "_write_all", staticmethod(record))
+
+    # A trickle of batches, each sooner than linger after the last, is
+    # still written once linger has passed since the first
+    async def main():
+        read_fd, write_fd = os.pipe()
+        writer = LineWriter(context=SyncContext(), io=os.fdopen(write_fd, "wb"),
+                            coalesce_bytes=4096, linger=0.2)
+        queue = asyncio.Queue()
+        swarm = AsyncCoordinator(TaskTemplate(args="cat"), count=1, writer_specs={})
+        pump = asyncio.create_task(swarm._write(writer, queue))
+        for i in range(10):
+            await queue.put(i)
+            await asyncio.sleep(0.05)
+        await queue.put(EOF)
+        await pump
+        os.close(read_fd)
+
+    asyncio.run(main())
+    assert len(writes) > 1
+    assert b"".join(writes) == b"".join(b"%d\n" % i for i in range(10))
+
+
+def test_results_from_stdout():
+    class IntReader(Reader):
+        def parse(self, record):
+            return int(record)
+
+    template = TaskTemplate(args="cat")
+    specs = {"stdin": WriterSpec(LineWriter)}
+    readers = {"stdout": ReaderSpec(IntReader)}
+
+    with Coordinator(template, count=2, writer_specs=specs, reader_specs=readers) as swarm:
+        swarm.feed_many(range(5000), chunk_size=100)
+
+    results = list(swarm.results())
+    assert sorted(result.value for result in results) == list(range(5000))
+    assert {result.id for result in results} <= {0, 1}
+    assert {result.channel for result in results} == {"stdout"}
+
+
+def test_results_callback_from_sideout():
+    # Child writes the length of each stdin line to the "lengths" channel
+    child = (
+        "import os, sys\n"
+        "side = open(int(os.environ['lengths']), 'w')\n"
+        "for line in sys.stdin:\n"
+        "    side.write(str(len(line.strip())) + '\\n')\n"
+    )
+    template = TaskTemplate(
+        args=["python", "-c", child],
+        sideout={"lengths": AnonChannel()}
+    )
+    specs = {"stdin": WriterSpec(Writer)}
+    readers = {"lengths": ReaderSpec()}
+
+    lengths = []
+    with Coordinator(
+        template, count=2, writer_specs=specs, reader_specs=readers,
+        on_result=lambda result: lengths.append(int(result.value))
+    ) as swarm:
+        for i in range(100):
+            swarm.feed(b"x" * i + b"\n")
+
+    assert sorted(lengths) == list(range(100))
+
+
+def test_ordered_results():
+    template = TaskTemplate(args="cat")
+    specs = {"stdin": WriterSpec(LineWriter)}
+    readers = {"stdout": ReaderSpec()}
+
+    values = []
+    with Coordinator(
+        template, count=4, writer_specs=specs, reader_specs=readers,
+        ordered=True, reorder_limit=256,
+        on_result=lambda result: values.append(int(result.value))
+    ) as swarm:
+        for i in range(500):
+            swarm.feed(i)
+        swarm.feed_many(range(500, 3000), chunk_size=50)
+
+    assert values == list(range(3000))
+
+
+def test_ordered_key_affinity():
+    class PairWriter(Writer):
+        def filter(self, batch):
+            return f"{batch[0]} {batch[1]}\n".encode()
+
+    template = TaskTemplate(args="cat")
+    specs = {"stdin": WriterSpec(PairWriter)}
+    readers = {"stdout": ReaderSpec()}
+
+    results = []
+    with Coordinator(
+        template, count=3, writer_specs=specs, reader_specs=readers,
+        ordered=True, key=lambda record: record[0], on_result=results.append
+    ) as swarm:
+        swarm.feed_many([(f"key{i % 7}", i) for i in range(1000)], chunk_size=50)
+
+    # In order overall, and each key's records from one task
+    assert [int(result.value.split()[1]) for result in results] == list(range(1000))
+    owners = {}
+    for result in results:
+        assert owners.setdefault(result.value.split()[0], result.id) == result.id
+
+
+def test_reader_errors():
+    # Two output records per input record break ordered mode
+    template = TaskTemplate(args="sed p")
+    specs = {"stdin": WriterSpec(LineWriter)}
+    readers = {"stdout": ReaderSpec()}
+    swarm = Coordinator(
+        template, count=2, writer_specs=specs, reader_specs=readers,
+        ordered=True, on_result=lambda result: None
+    )
+    with pytest.raises(RuntimeError, match="one output record per input record"):
+        with swarm:
+            for i in range(1000):
+                swarm.feed(i)
+    with pytest.raises(RuntimeError):
+        list(swarm.results())
+
+
+@pytest.mark.parametrize("dispatch", ["round_robin", "least_bytes", "writable"])
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_dispatch_policies(tmp_path, dispatch, engine):
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(LineWriter)}
+
+    with Coordinator(
+        template, count=3, writer_specs=specs, dispatch=dispatch, engine=engine
+    ) as swarm:
+        for i in range(2000):
+            swarm.feed(i)
+
+    output = "".join((tmp_path / f"{i}.out").read_text() for i in range(3))
+    assert sorted(int(line) for line in output.split()) == list(range(2000))
+
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+@pytest.mark.parametrize("dispatch", ["round_robin", "least_bytes", "writable"])
+def test_dispatch_dropped_channel(tmp_path, dispatch, engine):
+    # The only child closes its side channel at once, so every batch is
+    # dropped there instead of ever being written
+    template = TaskTemplate(
+        args=[sys.executable, "-c",
+              "import os, shutil, sys; os.close(int(os.environ['side'])); "
+              "shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"],
+        sidein={"side": AnonChannel()},
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(LineWriter), "side": WriterSpec(LineWriter, exhaust=False)}
+
+    with Coordinator(
+        template, count=1, writer_specs=specs, dispatch=dispatch, engine=engine
+    ) as swarm:
+        for i in range(2000):
+            swarm.feed(i)
+
+    assert sorted(map(int, (tmp_path / "0.out").read_text().split())) == list(range(2000))
+
+
+@pytest.mark.filterwarnings("ignore::subfeed.SkewWarning")
+def test_key_affinity(tmp_path):
+    class PairWriter(Writer):
+        def filter(self, batch):
+            return f"{batch[0]} {batch[1]}\n".encode()
+
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(PairWriter)}
+    records = [(f"key{i % 7}", i) for i in range(2000)]
+
+    with Coordinator(
+        template, count=3, writer_specs=specs, key=lambda record: record[0]
+    ) as swarm:
+        swarm.feed_many(records[:1000], chunk_size=64)
+        for record in records[1000:]:
+            swarm.feed(record)
+
+    owners = {}
+    seen = []
+    for i in range(3):
+        for line in (tmp_path / f"{i}.out").read_text().splitlines():
+            key, value = line.split()
+            assert owners.setdefault(key, i) == i
+            seen.append(int(value))
+    assert sorted(seen) == list(range(2000))
+    assert swarm.dispatcher.total == 2000
+
+
+def test_partition_skew():
+    dispatcher = Partitioned(key=lambda record: record, min_samples=100)
+    dispatcher.partition([None] * 4)
+    with pytest.warns(SkewWarning):
+        for i in range(200):
+            dispatcher._count(0 if i % 2 else i % 4, 1)
+    assert dispatcher.hot_partitions() == [0]
+    # Policies must say how they choose among workers with room
+    with pytest.raises(TypeError):
+        Dispatcher()
+
+
+def test_filter_pool(tmp_path):
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(TSVWriter, offload=True)}
+    rows = [(i, i * i, -i) for i in range(3000)]
+
+    with Coordinator(template, count=2, writer_specs=specs, filter_pool=2) as swarm:
+        swarm.feed_many(rows[:2000], chunk_size=100)
+        for row in rows[2000:]:
+            swarm.feed(row)
+
+    output = (tmp_path / "0.out").read_text() + (tmp_path / "1.out").read_text()
+    recovered = sorted(tuple(int(i) for i in line.split("\t")) for line in output.splitlines())
+    assert recovered == rows
+
+    # The epoll engine encodes on its loop thread, so it cannot offload
+    with pytest.raises(ValueError, match="offload"):
+        Coordinator(template, count=2, writer_specs=specs, engine="epoll")
+
+
+def test_raw_writes_and_file_regions(tmp_path):
+    import os
+
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"".join(b"region %d\n" % i for i in range(100)))
+    fd = os.open(source, os.O_RDONLY)
+    size = len(b"region 0\n")
+
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    specs = {"stdin": WriterSpec(Writer, raw=True, coalesce_bytes=1 << 16)}
+
+    with Coordinator(template, count=2, writer_specs=specs) as swarm:
+        for i in range(10):
+            swarm.feed(FileRegion(fd, offset=i * size, count=size))
+            swarm.feed(memoryview(b"bytes %d\n" % i))
+    os.close(fd)
+
+    output = (tmp_path / "0.out").read_text() + (tmp_path / "1.out").read_text()
+    expected = [f"region {i}" for i in range(10)] + [f"bytes {i}" for i in range(10)]
+    assert sorted(output.splitlines()) == sorted(expected)
+
+
+def test_pipe_size():
+    template = TaskTemplate(
+        args="cat > /dev/null",
+        sidein={"side": AnonChannel(pipe_size=1 << 17)},
+        pipe_size=1 << 18
+    )
+    # cat never reads "side", so it must not be required to drain
+    specs = {"stdin": WriterSpec(Writer), "side": WriterSpec(Writer, exhaust=False)}
+
+    with Coordinator(template, count=1, writer_specs=specs) as swarm:
+        swarm.feed(b"x\n")
+
+    sizes = swarm.tasks[0].pipe_sizes
+    if sizes["stdin"] is None:
+        pytest.skip("pipes cannot be resized on this platform")
+    assert sizes["stdin"] == 1 << 18
+    assert sizes["side"] == 1 << 17
+
+
+def test_stats():
+    snapshots = []
+    template = TaskTemplate(args="cat > /dev/null")
+    specs = {"stdin": WriterSpec(Writer)}
+
+    with Coordinator(
+        template, count=2, writer_specs=specs,
+        stats_interval=0.01, on_stats=snapshots.append
+    ) as swarm:
+        for _ in range(100):
+            swarm.feed(b"0123456789")
+        live = swarm.stats()
+
+    assert all(worker.alive for worker in live.workers)
+    final = snapshots[-1]
+    assert final.fed == 100
+    assert final.items_written == {"stdin": 100}
+    assert sum(w.channels["stdin"].bytes for w in final.workers) == 1000
+    assert not any(worker.alive for worker in final.workers)
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_prompt_shutdown(tmp_path, engine):
+    output = tmp_path / "out.txt"
+    template = TaskTemplate(args=f"cat >> {output}")
+    specs = {"stdin": WriterSpec(Writer)}
+
+    swarm = Coordinator(template, count=3, writer_specs=specs, engine=engine)
+    swarm.start()
+    for i in range(1000):
+        swarm.feed(f"{i}\n".encode())
+    start = time.perf_counter()
+    swarm.close()
+
+    # Every child saw EOF and exited, which cat only does at EOF. The
+    # bound only catches a hang, not a slow machine.
+    assert time.perf_counter() - start < 5
+    assert [task.process.returncode for task in swarm.tasks] == [0] * 3
+    assert sorted(map(int, output.read_text().split())) == list(range(1000))
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_autoscaling(tmp_path, engine):
+    output = tmp_path / "out.txt"
+    # Slow consumer of 16KiB records, so a few fill the pipe buffer
+    consume = "import sys, time\nfor line in sys.stdin.buffer: time.sleep(0.002); print(line[:8].decode())"
+    template = TaskTemplate(args=f"{sys.executable} -c '{consume}' >> {output}")
+    specs = {"stdin": WriterSpec(Writer)}
+
+    swarm = Coordinator(
+        template, count=1, min_count=1, max_count=3, writer_specs=specs,
+        engine=engine, common_queue_multiplier=4,
+        scale_up_after=0.05, scale_down_after=0.2, scale_interval=0.01
+    )
+    with swarm:
+        for i in range(300):
+            swarm.feed(f"{i:<8}".encode() + b"x" * 16376 + b"\n")
+        assert max(event.size for event in swarm.scaling_events) > 1
+
+        deadline = time.monotonic() + 10
+        while swarm.size > 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert swarm.size == 1
+
+    actions = [event.action for event in swarm.scaling_events]
+    assert "up" in actions and "down" in actions
+    assert len(swarm.tasks) == 1 + actions.count("up")
+    assert sorted(map(int, output.read_text().split())) == list(range(300))
+
+@pytest.mark.parametrize("delivery", ["at_least_once", "at_most_once"])
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_restart_and_replay(tmp_path, engine, delivery):
+    output = tmp_path / "out.txt"
+    marker = tmp_path / "crashed{id}"
+    # Task 0 closes its stdin and dies the first time it runs
+    template = TaskTemplate(
+        args=f"if [ {{id}} = 0 ] && [ ! -e {marker} ]; then touch {marker}; "
+             f"exec 0<&-; sleep 0.1; exit 3; fi; cat >> {output}"
+    )
+    specs = {"stdin": WriterSpec(Writer)}
+
+    with Coordinator(
+        template, count=2, writer_specs=specs, engine=engine,
+        restart=True, delivery=delivery, supervise_interval=0.01
+    ) as swarm:
+        for i in range(2000):
+            swarm.feed(f"{i}\n".encode())
+
+    [failure] = swarm.failures
+    assert failure.id == 0 and failure.restarted
+    # Only batches already in the dead task's pipe, or dropped under
+    # at_most_once, can be lost
+    received = set(map(int, output.read_text().split()))
+    assert received <= set(range(2000))
+    assert len(received) >= 2000 - failure.delivered - failure.dropped
+
+def test_restart_appends_sideout(tmp_path):
+    # Logs which run it is to a side output, dying after the first
+    child = tmp_path / "child.py"
+    child.write_text(
+        "import os, sys\n"
+        f"marker = {str(tmp_path / 'crashed')!r}\n"
+        "first = not os.path.exists(marker)\n"
+        "open(marker, 'w').close()\n"
+        "os.write(int(os.environ['log']), b'first\\n' if first else b'second\\n')\n"
+        "sys.exit(3) if first else sys.stdin.read()\n"
+    )
+    template = TaskTemplate(
+        args=f"{sys.executable} {child}",
+        sideout={"log": FileChannel(str(tmp_path / "{id}.log"))}
+    )
+    with Coordinator(
+        template, count=1, writer_specs={"stdin": WriterSpec(Writer)},
+        restart=True, supervise_interval=0.01
+    ) as swarm:
+        while not swarm.failures:
+            time.sleep(0.01)
+        swarm.feed(b"data\n")
+
+    assert (tmp_path / "0.log").read_text().split() == ["first", "second"]
+
+
+def test_shm_channel(tmp_path):
+    # Prints the length and checksum of every record in the ring
+    child = tmp_path / "child.py"
+    child.write_text(
+        "from subfeed import ShmReader\n"
+        "for record in ShmReader.from_env('tiles'):\n"
+        "    print(len(record), sum(record[::4096]), flush=True)\n"
+    )
+    template = TaskTemplate(
+        args=f"{sys.executable} {child}",
+        sidein={"tiles": ShmChannel(size=1 << 20)}
+    )
+    specs = {"tiles": WriterSpec(Writer)}
+    readers = {"stdout": ReaderSpec()}
+
+    # Records of up to 600KiB in a 1MiB ring, so it wraps and fills up
+    records = [bytes([i]) * (i * 10_000) for i in range(1, 61)]
+    with Coordinator(template, count=2, writer_specs=specs, reader_specs=readers) as swarm:
+        for record in records:
+            swarm.feed(record)
+
+    received = sorted(tuple(map(int, r.value.split())) for r in swarm.results())
+    assert received == sorted((len(r), sum(r[::4096])) for r in records)
+
+    # Each batch must stay one record
+    for options in ({"coalesce_bytes": 1 << 16, "linger": 0.05}, {"raw": True}):
+        with pytest.raises(ValueError):
+            Coordinator(template, count=1, writer_specs={"tiles": WriterSpec(Writer, **options)})
+
+
+def test_feed_from(tmp_path):
+    class UpperWriter(Writer):
+        def filter(self, batch):
+            return bytes(batch).upper() + b"\n"
+
+    # A regular file is mapped and passed through in whole-record blocks
+    source = tmp_path / "input.txt"
+    source.write_bytes(b"".join(b"record%d\n" % i for i in range(5000)))
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out"))
+    )
+    with Coordinator(template, count=2, writer_specs={"stdin": WriterSpec(Writer)}) as swarm:
+        assert swarm.feed_from(source, chunk_bytes=4096) == 5000
+    output = (tmp_path / "0.out").read_bytes() + (tmp_path / "1.out").read_bytes()
+    assert sorted(output.split()) == sorted(source.read_bytes().split())
+
+    # Length-prefixed records from a pipe are split out for filter()
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, "wb") as pipe:
+        pipe.write(b"".join(len(r).to_bytes(4, "big") + r for r in (b"a b", b"", b"c" * 9000)))
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.prefixed"))
+    )
+    with Coordinator(template, count=2, writer_specs={"stdin": WriterSpec(UpperWriter)}) as swarm:
+        assert swarm.feed_from(read_fd, delimiter=4, chunk_bytes=4096) == 3
+    os.close(read_fd)
+    output = (tmp_path / "0.prefixed").read_bytes() + (tmp_path / "1.prefixed").read_bytes()
+    assert sorted(output.splitlines()) == sorted([b"A B", b"", b"C" * 9000])
+
+    # Multi-byte delimiters end records, so every block ends with one
+    from subfeed.chunk import Splitter
+    records = [b"@r%d" % i * (i % 7) for i in range(2000)]
+    source.write_bytes(b"".join(record + b"\n@" for record in records))
+    splitter = Splitter(b"\n@", 256)
+    blocks = list(splitter.blocks(source.read_bytes()))
+    assert len(blocks) > 1 and all(block.endswith(b"\n@") for block in blocks)
+    assert [record for block in blocks for record in block.records()] == records
+    with open(source, "rb") as f:
+        regions = list(splitter.regions(f.fileno()))
+        assert [region.count for region in regions] == [len(block) for block in blocks]
+
+    # Streams on fds past select()'s limit of 1024
+    import resource
+    limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if limits[1] != resource.RLIM_INFINITY and limits[1] < 2048:
+        return
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(limits[0], 2048), limits[1]))
+    read_fd, write_fd = os.pipe()
+    try:
+        high = os.dup2(read_fd, 2000)
+        os.write(write_fd, b"a\nb\n")
+        os.close(write_fd)
+        assert [bytes(block) for block in splitter.read(high)] == [b"a\nb\n"]
+        os.close(high)
+    finally:
+        os.close(read_fd)
+        resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+
+
+@pytest.mark.parametrize("coalesce", [0, 4096])
+@pytest.mark.parametrize("dispatch", ["shared", "round_robin"])
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_broadcast(tmp_path, dispatch, engine, coalesce):
+    template = TaskTemplate(
+        args="cat; cat <&3 >&2",
+        sidein={"side": FileChannel(str(tmp_path / "{id}.side"))},
+        stdout=FileChannel(str(tmp_path / "{id}.out")),
+        stderr=FileChannel(str(tmp_path / "{id}.err"))
+    )
+    # The side channel skips the broadcast, also amid coalesced batches
+    specs = {"stdin": WriterSpec(LineWriter), "side": WriterSpec(LineWriter, coalesce_bytes=coalesce)}
+
+    with Coordinator(
+        template, count=3, writer_specs=specs, engine=engine, dispatch=dispatch
+    ) as swarm:
+        for i in range(500):
+            swarm.feed(i)
+        swarm.broadcast("mark", channels=["stdin"])
+        for i in range(500, 1000):
+            swarm.feed(i)
+
+    seen, side = [], []
+    for i in range(3):
+        lines = (tmp_path / f"{i}.out").read_text().split()
+        # Each worker gets it once, after earlier data and before later
+        mark = lines.index("mark")
+        assert lines.count("mark") == 1
+        assert all(int(line) < 500 for line in lines[:mark])
+        assert all(int(line) >= 500 for line in lines[mark + 1:])
+        seen += lines[:mark] + lines[mark + 1:]
+        side += (tmp_path / f"{i}.side").read_text().split()
+    assert sorted(map(int, seen)) == list(range(1000))
+    assert sorted(map(int, side)) == list(range(1000))
+
+
+def test_broadcast_retained_for_restarts(tmp_path):
+    output = tmp_path / "out.txt"
+    # Appends its input to output, and dies on "crash"
+    template = TaskTemplate(
+        args=f"while read line; do echo $line >> {output}; "
+             f"[ $line = crash ] && exit 3; done; true"
+    )
+    specs = {"stdin": WriterSpec(Writer)}
+
+    with Coordinator(
+        template, count=1, writer_specs=specs, restart=True, supervise_interval=0.01
+    ) as swarm:
+        swarm.broadcast(b"config\n", retain=True)
+        swarm.feed(b"crash\n")
+        while not swarm.failures:
+            time.sleep(0.01)
+        swarm.feed(b"after\n")
+
+    assert output.read_text().split() == ["config", "crash", "config", "after"]
+
+
+def test_warm_sessions(tmp_path):
+    # Sums each session's numbers, answering the marker with the sum
+    child = tmp_path / "child.py"
+    child.write_text(
+        "import sys\n"
+        "total = 0\n"
+        "for line in sys.stdin:\n"
+        "    if line == '--end--\\n':\n"
+        "        print(total)\n"
+        "        print('--end--', flush=True)\n"
+        "        total = 0\n"
+        "    else:\n"
+        "        total += int(line)\n"
+    )
+    template = TaskTemplate(args=f"{sys.executable} {child}")
+    # Plain words are exec'd without a shell
+    assert Task.from_template(template, {}).command()[1] is False
+    specs = {"stdin": WriterSpec(Writer)}
+    readers = {"stdout": ReaderSpec()}
+
+    with Coordinator(
+        template, count=3, writer_specs=specs, reader_specs=readers,
+        session_marker=b"--end--\n"
+    ) as pool:
+        pids = []
+        for job in [range(100), range(1000, 1010)]:
+            for i in job:
+                pool.feed(b"%d\n" % i)
+            assert pool.end_session(timeout=10)
+            assert sum(int(r.value) for r in pool.results()) == sum(job)
+            pids.append([task.process.pid for task in pool.tasks])
+        assert pids[0] == pids[1]
+
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_remote_agents(tmp_path, engine, monkeypatch):
+    from subfeed.agent import Agent
+    from subfeed.remote import AgentClient
+
+    # TCP agents refuse to run without a key
+    monkeypatch.delenv("SUBFEED_AGENT_KEY", raising=False)
+    with pytest.raises(ValueError, match="needs a key"):
+        Agent("tcp://127.0.0.1:0")
+
+    # Agents on this host over TCP and a Unix socket, mixed with a local task
+    monkeypatch.setenv("SUBFEED_AGENT_KEY", "secret")
+    agents = [
+        subprocess.Popen(
+            [sys.executable, "-m", "subfeed.agent", address],
+            stdout=subprocess.PIPE, text=True
+        )
+        for address in ["tcp://127.0.0.1:0", f"unix:{tmp_path / 'agent.sock'}"]
+    ]
+    try:
+        addresses = [agent.stdout.readline().split()[-1] for agent in agents]
+        template = TaskTemplate(
+            args="cat",
+            sidein={"side": AnonChannel()},
+            stderr=FileChannel(str(tmp_path / "{id}.err"))
+        )
+        specs = {"stdin": WriterSpec(Writer), "side": WriterSpec(Writer, exhaust=False)}
+        with Coordinator(
+            template, count=3, writer_specs=specs, engine=engine,
+            reader_specs={"stdout": ReaderSpec()}, agents=[None, *addresses]
+        ) as swarm:
+            for i in range(5000):
+                swarm.feed(b"%d\n" % i)
+
+        results = list(swarm.results())
+        assert sorted(int(r.value) for r in results) == list(range(5000))
+        assert {r.id for r in results} == {0, 1, 2}
+        assert [task.process.returncode for task in swarm.tasks] == [0, 0, 0]
+        # FileChannels of remote tasks live on the agent's host
+        assert all((tmp_path / f"{i}.err").exists() for i in range(3))
+
+        # Coordinators without the key are turned away
+        monkeypatch.setenv("SUBFEED_AGENT_KEY", "wrong")
+        with pytest.raises(PermissionError):
+            AgentClient(addresses[0])
+    finally:
+        for agent in agents:
+            agent.kill()
+            agent.wait()
+
+
+def test_cli(tmp_path):
+    from subfeed.cli import main
+
+    # A regular file is cut into spliced regions of whole records
+    source = tmp_path / "input.txt"
+    source.write_bytes(b"".join(b"record%d\n" % i for i in range(20000)))
+    output = str(tmp_path / "{id}.out")
+    assert main(["-j", "3", "-b", "4K", "-i", str(source), "-o", output, "--", "cat"]) == 0
+    lines = b"".join((tmp_path / f"{i}.out").read_bytes() for i in range(3)).splitlines()
+    assert sorted(lines) == sorted(source.read_bytes().splitlines())
+
+    # Length-prefixed records from a pipe, through python -m subfeed
+    records = [b"a", b"", b"b" * 9000]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    process = subprocess.run(
+        [sys.executable, "-m", "subfeed", "-j", "2", "--prefix", "4", "-b", "1K",
+         "-o", str(tmp_path / "{id}.prefixed"), "wc -c"],
+        input=b"".join(len(r).to_bytes(4, "big") + r for r in records), env=env
+    )
+    assert process.returncode == 0
+    counts = [int((tmp_path / f"{i}.prefixed").read_bytes()) for i in range(2)]
+    assert sum(counts) == sum(4 + len(r) for r in records)
+
+    # Failed copies set the exit status
+    assert main(["-j", "2", "-i", str(source), "-e", str(tmp_path / "err"), "exit 3"]) == 1
+
+    # Copies that stop reading early do not block the rest of the input
+    for engine in ("threads", "epoll"):
+        for dispatch in ("shared", "round_robin", "least_bytes", "writable"):
+            assert main(["-j", "2", "-b", "4K", "-i", str(source), "-o", output,
+                         "--engine", engine, "--dispatch", dispatch, "head -1"]) == 0
+            assert sorted((tmp_path / f"{i}.out").read_bytes().count(b"\n") for i in range(2)) == [1, 1]
+
+
+def test_placement(tmp_path):
+    cpus = sorted(os.sched_getaffinity(0))
+    template = TaskTemplate(
+        args=[sys.executable, "-c",
+              "import os; print(*sorted(os.sched_getaffinity(0)), os.getpriority(os.PRIO_PROCESS, 0))"],
+        stdout=FileChannel(str(tmp_path / "{id}.out")),
+        nice=5,
+        ioprio=(IOPRIO_CLASS_BE, 7)
+    )
+    # Tasks take one CPU each in turn, wrapping around
+    count = len(cpus) + 1
+    with Coordinator(template, count=count, writer_specs={"stdin": WriterSpec(Writer)}, pin="cpu"):
+        pass
+    for i in range(count):
+        *allowed, nice = map(int, (tmp_path / f"{i}.out").read_text().split())
+        assert allowed == [cpus[i % len(cpus)]]
+        assert nice == 5
+
+    # Reserved CPUs go to the Coordinator's threads and not to tasks
+    if len(cpus) > 1:
+        with Coordinator(template, count=2, writer_specs={"stdin": WriterSpec(Writer)}, coordinator_cpus=1):
+            pass
+        for i in range(2):
+            *allowed, nice = map(int, (tmp_path / f"{i}.out").read_text().split())
+            assert allowed == cpus[1:]
+    assert sorted(os.sched_getaffinity(0)) == cpus
+
+
+@pytest.mark.parametrize("engine", ["threads", "epoll"])
+def test_memory_budget(tmp_path, engine):
+    class NothingWriter(Writer):
+        def filter(self, batch):
+            return b""
+
+    template = TaskTemplate(
+        args="cat",
+        stdout=FileChannel(str(tmp_path / "{id}.out")),
+        sidein={"side": AnonChannel()}
+    )
+    specs = {"stdin": WriterSpec(Writer), "side": WriterSpec(NothingWriter)}
+    sizes = [10, 1000, 100_000, 300_000] * 50
+    budget = 1 << 20
+    with Coordinator(
+        template, count=2, writer_specs=specs, engine=engine, memory_budget=budget
+    ) as swarm:
+        for i, size in enumerate(sizes):
+            swarm.feed(bytes([65 + i % 26]) * (size - 1) + b"\n")
+
+    # Everything is released once written, and feed() held far fewer bytes
+    # than it fed. Encoded outputs are charged without waiting, so the
+    # exact peak depends on scheduling.
+    stats = swarm.stats()
+    assert stats.memory_used == 0
+    assert 0 < stats.memory_peak < sum(sizes) / 4
+    lines = b"".join((tmp_path / f"{i}.out").read_bytes() for i in range(2)).splitlines()
+    assert sorted(map(len, lines)) == sorted(size - 1 for size in sizes)
+
+    # A batch that would overflow the budget waits for a release
+    memory = MemoryBudget(10)
+    memory.acquire(8)
+    waiter = Thread(target=memory.acquire, args=(4,))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and memory.used == 8
+    memory.release(8)
+    waiter.join()
+    assert memory.used == 4
+
+@pytest.mark.parametrize("engine, pool", [("threads", 0), ("epoll", 0), ("threads", 2)])
+def test_tracing(tmp_path, engine, pool):
+    template = TaskTemplate(args="cat", stdout=FileChannel(str(tmp_path / "{id}.out")))
+    specs = {"stdin": WriterSpec(TSVWriter, offload=bool(pool))}
+    with Coordinator(
+        template, count=2, writer_specs=specs, engine=engine, filter_pool=pool, trace_rate=1.
+    ) as swarm:
+        for i in range(100):
+            swarm.feed((i, "x" * i))
+
+    # Every batch passed each stage in order, on the worker that took it
+    traces = list(swarm.tracer.traces)
+    assert len(traces) == 100
+    for trace in traces:
+        dequeued, encoded, written = trace.channels["stdin"]
+        assert trace.fed <= trace.queued and trace.fed <= trace.taken <= dequeued <= encoded <= written
+        assert trace.worker in (0, 1)
+    histograms = swarm.tracer.histograms()
+    assert {"feed", "common", "stdin.queue", "stdin.filter", "stdin.write", "total"} <= set(histograms)
+    assert histograms["total"].count == 100
+    assert sum(h.count for (stage, _), h in swarm.tracer.histograms(per_worker=True).items()
+               if stage == "total") == 100
+
+    path = tmp_path / "trace.json"
+    swarm.tracer.export(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert sum(event["ph"] == "b" for event in events) == 5 * 100
+
+    # Unsampled batches are left alone
+    sampled = Tracer(0.01, seed=0)
+    assert 50 < sum(sampled.sample() is not None for _ in range(10_000)) < 200